@@ -5,24 +5,203 @@ This module defines the Flask web application for the BrokerBuddy tool.
 It includes routes for the main pages, client input form, and lender matching.
 """
 
-from flask import Flask, render_template, request, redirect, url_for, jsonify, flash, session
+from flask import (Flask, render_template, request, redirect, url_for, jsonify, flash, session, g,
+                   has_request_context, Response, stream_with_context, abort, send_from_directory)
 import sqlite3
 import json
 import os
 import sys
+import io
+import csv
+import threading
+import atexit
+import gc
+import time
+import hmac
+import math
 sys.path.append('/home/ubuntu/brokerbuddy')
 from database_schema import BrokerBuddyDB
+from matching_engine import MatchingEngine
+from lender_catalog import CompiledLenderCatalog, ClientProfile
+from matcher_stats import MatcherStats
+from sql_trace import SQLTracer
+from sampling_profiler import SamplingProfiler
+from match_cache import MatchCache
+from match_writer import MatchWriter
+import shared_catalog
+from jinja2 import Template
+from request_metrics import MetricsRegistry, COUNT_BUCKETS
 
 # Create Flask application
 app = Flask(__name__)
 app.secret_key = 'brokerbuddy_secret_key'  # For session and flash messages
 
+# SQLite database the routes read and write, set per deployment like in wsgi.py
+DATABASE_PATH = os.environ.get('DATABASE_PATH', BrokerBuddyDB().db_path)
+
+# Compiled lender catalog shared by every request in this process
+_lender_catalog = None
+_lender_catalog_lock = threading.Lock()
+
+# Seconds between checks of the lender catalog version; changes made by other
+# workers, the importer or direct SQL are picked up within this interval
+CATALOG_CHECK_INTERVAL = float(os.environ.get('CATALOG_CHECK_INTERVAL_MS', 1000)) / 1000
+_catalog_checked_at = 0.0
+_catalog_rebuild = None
+_catalog_rebuild_lock = threading.Lock()
+
+# Optional file the lenders' scoring arrays are published to and every worker
+# maps read-only; results pages and batch matching score from it instead of
+# compiling the catalog in each worker
+SHARED_CATALOG_PATH = os.environ.get('SHARED_CATALOG_PATH')
+_shared_catalog = None
+_shared_catalog_checked_at = None
+_shared_catalog_lock = threading.Lock()
+
+# Ranked match lists keyed by client profile and lender catalog version
+match_cache = MatchCache(
+    max_bytes=int(os.environ.get('MATCH_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+    ttl=float(os.environ.get('MATCH_CACHE_TTL', 300))
+)
+
+# Optional background persistence of match results, flushed when the process exits
+match_writer = None
+if os.environ.get('MATCH_WRITE_BEHIND') == '1':
+    match_writer = MatchWriter(
+        DATABASE_PATH,
+        max_pending=int(os.environ.get('MATCH_WRITER_MAX_PENDING', 1000)),
+        flush_interval=float(os.environ.get('MATCH_WRITER_FLUSH_INTERVAL', 1.0))
+    )
+    atexit.register(match_writer.close)
+
+# Per-request phase timings, served in Prometheus format at /metrics
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+metrics = MetricsRegistry()
+request_count = metrics.counter(
+    'brokerbuddy_requests_total', 'Requests handled, by endpoint and status code',
+    labels=('endpoint', 'status'))
+request_seconds = metrics.histogram(
+    'brokerbuddy_request_seconds', 'Time to handle a request, in seconds', labels=('endpoint',))
+phase_seconds = metrics.histogram(
+    'brokerbuddy_request_phase_seconds',
+    'Time spent in each phase of a request (db_connect, db, catalog, match, render), in seconds',
+    labels=('endpoint', 'phase'))
+request_queries = metrics.histogram(
+    'brokerbuddy_request_queries', 'SQL statements executed per request',
+    buckets=COUNT_BUCKETS, labels=('endpoint',))
+request_lenders_scored = metrics.histogram(
+    'brokerbuddy_request_lenders_scored', 'Lenders scored by the matching engine per request',
+    buckets=COUNT_BUCKETS, labels=('endpoint',))
+
+# Per-criterion and per-lender profiling of a sample of matching requests
+matcher_stats = MatcherStats(sample_rate=float(os.environ.get('MATCHER_STATS_SAMPLE_RATE', 0.01)))
+
+# Phases reported in the Server-Timing header and phase histogram, in order
+TIMED_PHASES = ('db_connect', 'db', 'catalog', 'match', 'render')
+
+def record_phase(name, value):
+    """Add time (or a count) to one phase of the current request."""
+    if METRICS_ENABLED and has_request_context():
+        phases = g.setdefault('phases', {})
+        phases[name] = phases.get(name, 0) + value
+
+class TimedTemplate(Template):
+    """Jinja template that records its render time as the request's render phase."""
+    
+    def render(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            record_phase('render', time.perf_counter() - start)
+
+app.jinja_env.template_class = TimedTemplate
+
+# SQL statement tracing with N+1 and slow query detection, off unless SQL_TRACE=1;
+# it can also be switched on and off from the /admin/sql-trace panel
+sql_tracer = SQLTracer(
+    enabled=os.environ.get('SQL_TRACE') == '1',
+    slow_ms=float(os.environ.get('SQL_TRACE_SLOW_MS', 50)),
+    n_plus_one=int(os.environ.get('SQL_TRACE_N_PLUS_ONE', 5)),
+    log_path=os.environ.get('SQL_TRACE_LOG',
+                            os.path.join(os.path.dirname(os.path.abspath(DATABASE_PATH)), 'sql_trace.log'))
+)
+BrokerBuddyDB.tracer = sql_tracer
+
+# The diagnostic endpoints (matcher stats, SQL trace, profiler) are available
+# only when ADMIN_TOKEN is set; PROFILER_TOKEN is its earlier name
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN') or os.environ.get('PROFILER_TOKEN')
+
+# On-demand sampling profiler
+profiler = SamplingProfiler(
+    os.environ.get('PROFILER_OUTPUT_DIR',
+                   os.path.join(os.path.dirname(os.path.abspath(DATABASE_PATH)), 'profiles')),
+    interval=float(os.environ.get('PROFILER_INTERVAL_MS', 10)) / 1000
+)
+
+# Request each thread is handling, so the profiler samples only request threads
+_active_requests = {}
+
 # Database connection helper
-def get_db():
-    db = BrokerBuddyDB()
+def get_db(readonly=False):
+    db = BrokerBuddyDB(DATABASE_PATH, readonly=readonly)
+    start = time.perf_counter()
     db.connect()
+    if has_request_context():
+        record_phase('db_connect', time.perf_counter() - start)
+        # Track every connection so it can be released and its query count reported
+        g.setdefault('dbs', []).append(db)
     return db
 
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    rule = request.url_rule.rule if request.url_rule is not None else request.path
+    _active_requests[threading.get_ident()] = f"{request.method} {rule}"
+    if sql_tracer.enabled:
+        sql_tracer.begin(f"{request.method} {request.path}")
+
+@app.teardown_request
+def release_db(exception=None):
+    """Return the request's connections to the pool, rolling back anything left uncommitted."""
+    for db in g.get('dbs', []):
+        db.close()
+    sql_tracer.end()
+    _active_requests.pop(threading.get_ident(), None)
+
+@app.after_request
+def add_query_count(response):
+    """Report how many SQL statements the request executed."""
+    response.headers['X-Query-Count'] = str(sum(db.query_count for db in g.get('dbs', [])))
+    return response
+
+@app.after_request
+def record_request_metrics(response):
+    """Record the request's duration and phase timings, and report them in a Server-Timing header."""
+    if not METRICS_ENABLED or 'request_start' not in g:
+        return response
+    
+    elapsed = time.perf_counter() - g.request_start
+    dbs = g.get('dbs', [])
+    phases = g.get('phases', {})
+    phases['db'] = sum(db.query_seconds for db in dbs)
+    endpoint = request.endpoint or 'none'
+    
+    request_count.inc(endpoint, str(response.status_code))
+    request_seconds.observe(elapsed, endpoint)
+    request_queries.observe(sum(db.query_count for db in dbs), endpoint)
+    if 'lenders_scored' in phases:
+        request_lenders_scored.observe(phases['lenders_scored'], endpoint)
+    
+    timings = []
+    for phase in TIMED_PHASES:
+        if phase in phases:
+            phase_seconds.observe(phases[phase], endpoint, phase)
+            timings.append(f"{phase};dur={phases[phase] * 1000:.2f}")
+    timings.append(f"total;dur={elapsed * 1000:.2f}")
+    response.headers['Server-Timing'] = ', '.join(timings)
+    return response
+
 # Routes
 @app.route('/')
 def index():
@@ -53,8 +232,9 @@ def submit_client():
         for field in request.form:
             client_data[field] = request.form[field]
         
-        # Store in session for results page
+        # Store in session for results page; a new search is not yet a saved client
         session['client_data'] = client_data
+        session.pop('client_id', None)
         
         # Redirect to results page
         return redirect(url_for('results'))
@@ -71,13 +251,40 @@ def results():
         flash('No client data found. Please fill out the form first.')
         return redirect(url_for('client_form'))
     
-    # Find matching lenders
-    matches = find_matching_lenders(client_data)
+    # Find matching lenders, optionally limited to one program type, to
+    # lenders whose hard requirements the client meets, or to the best few.
+    # Only scores are computed here; the page fetches a lender's match
+    # details from explain_match when they are expanded.
+    matches = find_matching_lenders(client_data, request.args.get('program_type'),
+                                    strict=request.args.get('strict') == '1',
+                                    limit=request.args.get('limit', type=int),
+                                    details=False)
     
     return render_template('results.html', 
                           client_data=client_data, 
                           matches=matches)
 
+@app.route('/save-client', methods=['POST'])
+def save_client():
+    """Save the client in the session, with its matches, for lender prospects and re-matching."""
+    client_data = session.get('client_data', {})
+    if not client_data:
+        flash('No client data found. Please fill out the form first.')
+        return redirect(url_for('client_form'))
+    
+    db = get_db()
+    client_id = db.save_client(client_data, session.get('client_id'))
+    db.close()
+    
+    # Store the client's matches with their details, so a lender change can
+    # re-check only the criteria that changed
+    save_matches(client_id, find_matching_lenders(client_data))
+    
+    # Saving again from the same results page updates this client
+    session['client_id'] = client_id
+    flash('Client saved.')
+    return redirect(url_for('results'))
+
 @app.route('/lender/<int:lender_id>')
 def lender_details(lender_id):
     """Display detailed information about a specific lender."""
@@ -112,6 +319,25 @@ def lender_details(lender_id):
                           lender=lender, 
                           criteria=criteria)
 
+@app.route('/lender/<int:lender_id>/prospects')
+def lender_prospects(lender_id):
+    """Display the saved clients a lender would accept."""
+    db = get_db(readonly=True)
+    engine = MatchingEngine(db.conn, get_lender_catalog(db))
+    
+    lender = engine.get_catalog().get(lender_id)
+    if lender is None:
+        db.close()
+        flash('Lender not found.')
+        return redirect(url_for('admin'))
+    
+    prospects = engine.find_matching_clients(lender_id)
+    db.close()
+    
+    return render_template('lender_prospects.html',
+                          lender=lender,
+                          prospects=prospects)
+
 @app.route('/admin')
 def admin():
     """Admin page for managing lenders and criteria."""
@@ -139,12 +365,95 @@ def admin():
                           lenders=lenders, 
                           categories=categories)
 
+def require_admin_token():
+    """Reject the request unless it carries ADMIN_TOKEN in an X-Admin-Token header."""
+    if not ADMIN_TOKEN:
+        abort(404)
+    # Only a header: query strings end up in access and proxy logs
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+        abort(403)
+
+@app.route('/admin/matcher-stats')
+def admin_matcher_stats():
+    """Per-criterion and per-lender matching costs and the lender values that cannot be parsed."""
+    require_admin_token()
+    db = get_db(readonly=True)
+    catalog = get_lender_catalog(db)
+    db.close()
+    
+    return render_template('matcher_stats.html', stats=matcher_stats.snapshot(catalog))
+
+@app.route('/api/matcher-stats', methods=['GET', 'DELETE'])
+def matcher_stats_api():
+    """Matcher profiling counters as JSON; DELETE resets them."""
+    require_admin_token()
+    if request.method == 'DELETE':
+        matcher_stats.reset()
+        return jsonify({'reset': True})
+    
+    db = get_db(readonly=True)
+    catalog = get_lender_catalog(db)
+    db.close()
+    
+    return jsonify(matcher_stats.snapshot(catalog, top=request.args.get('top', 50, type=int)))
+
+@app.route('/admin/sql-trace', methods=['GET', 'POST'])
+def admin_sql_trace():
+    """SQL trace debug panel: recent requests, N+1 patterns and slow statements."""
+    require_admin_token()
+    if request.method == 'POST':
+        sql_tracer.enabled = request.form.get('enabled') == '1'
+        flash(f"SQL tracing {'enabled' if sql_tracer.enabled else 'disabled'} in this worker.")
+        return redirect(url_for('admin_sql_trace'))
+    
+    return render_template('sql_trace.html', trace=sql_tracer.snapshot())
+
+@app.route('/api/sql-trace')
+def sql_trace_api():
+    """SQL trace counters, recent request traces and slow statements as JSON."""
+    require_admin_token()
+    return jsonify(sql_tracer.snapshot())
+
+@app.route('/admin/profiler', methods=['GET', 'POST'])
+def admin_profiler():
+    """
+    Sample the stacks of the requests this worker handles.
+    
+    POST starts sampling for `seconds` (default 10, at most the profiler's
+    max_seconds) and returns at once; GET
+    reports whether this worker is sampling and lists the collapsed stack
+    files written by every worker.
+    """
+    require_admin_token()
+    if request.method == 'POST':
+        try:
+            seconds = float(request.args.get('seconds', 10))
+        except ValueError:
+            seconds = float('nan')
+        if not math.isfinite(seconds) or seconds <= 0:
+            return jsonify({'error': "seconds must be a positive number"}), 400
+        seconds = min(seconds, profiler.max_seconds)
+        if not profiler.start(seconds, lambda: dict(_active_requests)):
+            return jsonify(dict(profiler.status(), error="A profile is already running in this worker")), 409
+        return jsonify(profiler.status()), 202
+    
+    return jsonify(dict(profiler.status(), profiles=profiler.profiles()))
+
+@app.route('/admin/profiler/<name>')
+def admin_profiler_download(name):
+    """Download a collapsed stack file for flamegraph.pl or speedscope."""
+    require_admin_token()
+    return send_from_directory(profiler.output_dir, name, mimetype='text/plain', as_attachment=True)
+
 @app.route('/update-lender/<int:lender_id>', methods=['GET', 'POST'])
 def update_lender(lender_id):
     """Update lender information and criteria."""
     db = get_db()
     
     if request.method == 'POST':
+        old_criteria = db.get_lender_criteria(lender_id)
+        
         # Update lender information
         name = request.form.get('name')
         program_type = request.form.get('program_type')
@@ -167,8 +476,21 @@ def update_lender(lender_id):
                     VALUES (?, ?, ?, CURRENT_TIMESTAMP)
                 """, (lender_id, category_id, value))
         
+        # Matching structures are rebuilt from the new criteria on the next request
+        db.refresh_lender_profiles([lender_id])
+        db.bump_catalog_version()
         db.conn.commit()
         flash('Lender updated successfully.')
+        
+        # Bring saved clients' matches with this lender up to date
+        new_criteria = db.get_lender_criteria(lender_id)
+        changed = {category for category in set(old_criteria) | set(new_criteria)
+                   if old_criteria.get(category) != new_criteria.get(category)}
+        if changed:
+            engine = MatchingEngine(db.conn, get_lender_catalog(db, fresh=True))
+            report = engine.rematch_lender(lender_id, changed)
+            flash(f"Re-matched {report['clients']} saved clients; "
+                  f"{len(report['ranking_changed'])} rankings changed.")
         return redirect(url_for('admin'))
     
     # GET request - show form with current values
@@ -263,192 +585,345 @@ def crm_settings():
     
     return render_template('crm_settings.html', integrations=integrations)
 
-# Helper functions
-def find_matching_lenders(client_data):
-    """Find lenders that match the client criteria."""
-    db = get_db()
-    
-    # Get all lenders
-    db.cursor.execute("""
-        SELECT id, name, program_type
-        FROM lenders
-        ORDER BY name
-    """)
-    lenders = db.cursor.fetchall()
-    
-    matches = []
+@app.route('/api/match/batch', methods=['POST'])
+def match_batch():
+    """
+    Match many client profiles in one request.
+    
+    Accepts a JSON-lines or CSV request body with one client profile per line,
+    and streams back one NDJSON line per client with its ranked lenders as the
+    input is read. Neither the upload nor the response is held in memory.
+    
+    Query parameters:
+        format: 'jsonl' or 'csv' (detected from the content type if omitted)
+        program_type: Only match lenders of this program type
+        limit: Maximum number of lenders returned per client
+    """
+    data_format = request.args.get('format')
+    if not data_format:
+        data_format = 'csv' if 'csv' in request.mimetype else 'jsonl'
+    if data_format not in ('csv', 'jsonl'):
+        return jsonify({'error': f"Unsupported format: {data_format}"}), 400
+    
+    program_type = request.args.get('program_type')
+    limit = request.args.get('limit', type=int)
+    
+    # Build the engine up front so the stream only does in-memory matching
+    db = get_db(readonly=True)
+    engine = get_scoring_engine(db)
+    db.close()
     
-    for lender in lenders:
-        # Calculate match score for this lender
-        match_score, match_details = calculate_match_score(db, lender['id'], client_data)
-        
-        if match_score > 0:
-            matches.append({
-                'lender_id': lender['id'],
-                'lender_name': lender['name'],
-                'program_type': lender['program_type'],
-                'match_score': match_score,
-                'match_details': match_details
-            })
+    def generate():
+        # Batch clients are one-off, so they bypass the match cache rather than
+        # evicting the results pages it holds
+        match_seconds = 0.0
+        scored = engine.lenders_scored
+        try:
+            for line_number, client_data, error in read_client_profiles(request.stream, data_format):
+                result = {'line': line_number}
+                if error:
+                    result['error'] = error
+                else:
+                    if 'client_name' in client_data:
+                        result['client_name'] = client_data['client_name']
+                    start = time.perf_counter()
+                    matches = engine.find_matching_lenders(client_data, program_type, limit=limit,
+                                                           details=False)
+                    match_seconds += time.perf_counter() - start
+                    result['matches'] = [{
+                        'lender_id': match['lender_id'],
+                        'lender_name': match['lender_name'],
+                        'program_type': match['program_type'],
+                        'match_score': match['match_score']
+                    } for match in matches]
+                yield json.dumps(result) + '\n'
+        finally:
+            # The body is streamed after record_request_metrics has run, so
+            # the batch's matching time is recorded here
+            if METRICS_ENABLED:
+                phase_seconds.observe(match_seconds, 'match_batch', 'match')
+                request_lenders_scored.observe(engine.lenders_scored - scored, 'match_batch')
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/match/explain/<int:lender_id>', methods=['GET', 'POST'])
+def explain_match(lender_id):
+    """
+    Explain a lender's match score criterion by criterion.
+    
+    Explains the client in the session, or the client profile posted as a
+    JSON object.
+    """
+    if request.method == 'POST':
+        record = request.get_json(silent=True)
+        if not isinstance(record, dict):
+            return jsonify({'error': "Expected a JSON object"}), 400
+        client_data = {key: str(value) for key, value in record.items() if value is not None}
+    else:
+        client_data = session.get('client_data')
+        if not client_data:
+            return jsonify({'error': "No client data found"}), 404
     
+    db = get_db(readonly=True)
+    engine = MatchingEngine(db.conn, get_lender_catalog(db))
     db.close()
     
-    # Sort matches by score (highest first)
-    matches.sort(key=lambda x: x['match_score'], reverse=True)
-    
-    return matches
+    lender = engine.get_catalog().get(lender_id)
+    if lender is None:
+        return jsonify({'error': "Lender not found"}), 404
+    
+    start = time.perf_counter()
+    match_score, match_details = engine.calculate_match_score(lender_id, client_data)
+    record_phase('match', time.perf_counter() - start)
+    record_phase('lenders_scored', 1)
+    return jsonify({
+        'lender_id': lender.id,
+        'lender_name': lender.name,
+        'match_score': match_score,
+        'match_details': match_details
+    })
 
-def calculate_match_score(db, lender_id, client_data):
-    """Calculate a match score between a lender and client data."""
-    # Get lender criteria
-    db.cursor.execute("""
-        SELECT c.name, c.description, lc.value
-        FROM lender_criteria lc
-        JOIN criteria_categories c ON lc.category_id = c.id
-        WHERE lc.lender_id = ?
-    """, (lender_id,))
-    lender_criteria = db.cursor.fetchall()
-    
-    # Initialize score and details
-    score = 0
-    max_possible_score = 0
-    details = []
-    
-    # Check each criterion
-    for criterion in lender_criteria:
-        criterion_name = criterion['name']
-        criterion_value = criterion['value']
-        client_value = client_data.get(criterion_name, '')
-        
-        # Skip if no client value or lender value
-        if not client_value or not criterion_value:
+@app.route('/api/match/cache')
+def match_cache_stats():
+    """Match cache hit, miss and eviction counters."""
+    return jsonify(match_cache.stats())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Request counters and timing histograms for this worker, in Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/match/writer')
+def match_writer_stats():
+    """Write-behind queue counters."""
+    if match_writer is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(match_writer.stats(), enabled=True))
+
+# Helper functions
+def read_client_profiles(stream, data_format):
+    """
+    Read client profiles one at a time from a binary JSON-lines or CSV stream.
+    
+    Yields:
+        tuple: (line_number, client_data, error) where client_data maps field
+            names to string values and error is None unless the line was invalid
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    
+    if data_format == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            client_data = {key: value for key, value in row.items() if key and value is not None}
+            yield reader.line_num, client_data, None
+        return
+    
+    for line_number, line in enumerate(text, 1):
+        line = line.strip()
+        if not line:
             continue
-        
-        # Different matching logic based on criterion type
-        match_result = False
-        reason = ''
-        
-        if criterion_name == 'amount_considered':
-            # Check if client amount is within lender's range
-            match_result, reason = match_amount(client_value, criterion_value)
-        elif criterion_name == 'time_in_business':
-            # Check if client's time in business meets lender's requirement
-            match_result, reason = match_time_in_business(client_value, criterion_value)
-        elif criterion_name == 'personal_credit':
-            # Check if client's credit score meets lender's requirement
-            match_result, reason = match_credit_score(client_value, criterion_value)
-        else:
-            # Generic string matching for other criteria
-            match_result = client_value.lower() in criterion_value.lower()
-            reason = f"Client: {client_value}, Lender: {criterion_value}"
-        
-        # Update score and details
-        max_possible_score += 1
-        if match_result:
-            score += 1
-            details.append({
-                'criterion': criterion_name,
-                'result': 'Match',
-                'reason': reason
-            })
-        else:
-            details.append({
-                'criterion': criterion_name,
-                'result': 'No Match',
-                'reason': reason
-            })
-    
-    # Calculate percentage score if there were any criteria to match
-    percentage_score = (score / max_possible_score * 100) if max_possible_score > 0 else 0
-    
-    return percentage_score, details
-
-def match_amount(client_amount, lender_range):
-    """Check if client amount is within lender's range."""
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Expected a JSON object"
+            continue
+        # Form submissions are strings, so normalize JSON numbers the same way
+        client_data = {key: str(value) for key, value in record.items() if value is not None}
+        yield line_number, client_data, None
+
+def get_lender_catalog(db, fresh=False):
+    """
+    Return the compiled lender catalog.
+    
+    The lender catalog version is checked at most once per
+    CATALOG_CHECK_INTERVAL. When it has changed, a new catalog is built on a
+    background thread and swapped in when ready, while requests keep using
+    the current one.
+    
+    Args:
+        db (BrokerBuddyDB): Open database connection
+        fresh (bool): Check the version now and wait for any rebuild, for
+            callers that must see lender changes they have just committed
+    """
+    global _catalog_checked_at
+    catalog = _lender_catalog
+    now = time.monotonic()
+    
+    if catalog is None or fresh:
+        version = db.get_catalog_version()
+        if catalog is None or catalog.version != version:
+            with _lender_catalog_lock:
+                catalog = _lender_catalog
+                if catalog is None or catalog.version != version:
+                    start = time.perf_counter()
+                    catalog = build_lender_catalog(db, version)
+                    record_phase('catalog', time.perf_counter() - start)
+        _catalog_checked_at = now
+    elif now - _catalog_checked_at >= CATALOG_CHECK_INTERVAL:
+        _catalog_checked_at = now
+        if db.get_catalog_version() != catalog.version:
+            start_catalog_rebuild()
+    
+    return catalog
+
+def build_lender_catalog(db, version):
+    """Build the catalog at a version and make it the one requests use."""
+    global _lender_catalog
+    catalog = CompiledLenderCatalog.build(db.conn, version)
+    _lender_catalog = catalog
+    app.logger.info(f"Built lender catalog: {catalog.stats()}")
+    return catalog
+
+def start_catalog_rebuild():
+    """Rebuild the lender catalog on a background thread unless a rebuild is already running."""
+    global _catalog_rebuild
+    with _catalog_rebuild_lock:
+        if _catalog_rebuild is not None and _catalog_rebuild.is_alive():
+            return
+        _catalog_rebuild = threading.Thread(target=rebuild_lender_catalog, name='catalog-rebuild',
+                                            daemon=True)
+        _catalog_rebuild.start()
+
+def rebuild_lender_catalog():
+    """Build the catalog for the current lender data on this thread's own connection."""
+    db = BrokerBuddyDB(DATABASE_PATH, readonly=True)
+    db.connect()
     try:
-        # Remove non-numeric characters and convert to float
-        client_amount = float(client_amount.replace('$', '').replace(',', ''))
-        
-        # Extract min and max from lender range (e.g., "$10k-$150k")
-        lender_range = lender_range.replace('$', '').replace(',', '')
-        parts = lender_range.split('-')
-        
-        min_amount = parse_amount(parts[0])
-        max_amount = parse_amount(parts[1]) if len(parts) > 1 else float('inf')
-        
-        match_result = min_amount <= client_amount <= max_amount
-        reason = f"Client: ${client_amount:,.2f}, Lender: {lender_range}"
-        
-        return match_result, reason
-    except:
-        return False, f"Could not parse amount: Client: {client_amount}, Lender: {lender_range}"
-
-def parse_amount(amount_str):
-    """Parse amount string with k/m suffixes."""
-    amount_str = amount_str.strip().lower()
-    
-    if 'k' in amount_str:
-        return float(amount_str.replace('k', '')) * 1000
-    elif 'm' in amount_str:
-        return float(amount_str.replace('m', '')) * 1000000
-    else:
-        return float(amount_str)
+        version = db.get_catalog_version()
+        with _lender_catalog_lock:
+            catalog = _lender_catalog
+            if catalog is None or catalog.version != version:
+                build_lender_catalog(db, version)
+    except Exception as e:
+        # Keep serving the current catalog; the next check retries
+        app.logger.error(f"Lender catalog rebuild failed: {e}")
+    finally:
+        db.close()
+        BrokerBuddyDB.close_pool()
 
-def match_time_in_business(client_time, lender_requirement):
-    """Check if client's time in business meets lender's requirement."""
+def get_shared_catalog(db):
+    """
+    Return the memory-mapped shared catalog, or None if SHARED_CATALOG_PATH is not set or unusable.
+    
+    The file's version is compared with the lender catalog version at most
+    once per CATALOG_CHECK_INTERVAL. When it is behind, the first worker to
+    notice publishes the new version and the others map it, without a restart.
+    
+    Args:
+        db (BrokerBuddyDB): Open database connection
+    """
+    global _shared_catalog, _shared_catalog_checked_at
+    if not SHARED_CATALOG_PATH:
+        return None
+    
+    now = time.monotonic()
+    checked_at = _shared_catalog_checked_at
+    if checked_at is not None and now - checked_at < CATALOG_CHECK_INTERVAL:
+        return _shared_catalog
+    
+    with _shared_catalog_lock:
+        checked_at = _shared_catalog_checked_at
+        if checked_at is not None and now - checked_at < CATALOG_CHECK_INTERVAL:
+            return _shared_catalog
+        version = db.get_catalog_version()
+        if _shared_catalog is None or _shared_catalog.version != version:
+            start = time.perf_counter()
+            try:
+                _shared_catalog = shared_catalog.load_or_publish(SHARED_CATALOG_PATH, db.conn, version)
+                app.logger.info(f"Mapped shared lender catalog version {version} from {SHARED_CATALOG_PATH}")
+            except (OSError, ValueError, sqlite3.Error) as e:
+                # Requests use this process's compiled catalog until the next check
+                _shared_catalog = None
+                app.logger.warning(f"Could not share lender catalog through {SHARED_CATALOG_PATH}: {e}")
+            record_phase('catalog', time.perf_counter() - start)
+        _shared_catalog_checked_at = now
+    
+    return _shared_catalog
+
+def get_scoring_engine(db):
+    """Return an engine for scoring without match details, from the shared catalog if there is one."""
+    shared = get_shared_catalog(db)
+    if shared is not None:
+        return MatchingEngine(db.conn, shared=shared)
+    return MatchingEngine(db.conn, get_lender_catalog(db))
+
+def preload_lender_catalog():
+    """Build the lender catalog, and map the shared one, before workers are forked so they inherit them."""
+    db = get_db(readonly=True)
     try:
-        # Convert to months for comparison
-        client_months = parse_time_in_business(client_time)
-        lender_months = parse_time_in_business(lender_requirement)
-        
-        match_result = client_months >= lender_months
-        reason = f"Client: {client_time}, Lender requires: {lender_requirement}"
-        
-        return match_result, reason
-    except:
-        return False, f"Could not parse time: Client: {client_time}, Lender: {lender_requirement}"
-
-def parse_time_in_business(time_str):
-    """Parse time in business string to months."""
-    time_str = time_str.lower()
-    
-    if 'year' in time_str or 'yr' in time_str:
-        # Extract number of years
-        years = float(''.join(c for c in time_str if c.isdigit() or c == '.'))
-        return years * 12
-    elif 'month' in time_str or 'mo' in time_str:
-        # Extract number of months
-        return float(''.join(c for c in time_str if c.isdigit() or c == '.'))
-    else:
-        # Assume it's just a number representing years
-        return float(''.join(c for c in time_str if c.isdigit() or c == '.')) * 12
+        get_lender_catalog(db)
+        get_shared_catalog(db)
+    finally:
+        db.close()
+        # Connections must not cross a fork; each worker opens its own
+        BrokerBuddyDB.close_pool()
+    
+    # Keep the compiled catalog out of the collector's reach so collections in
+    # the workers do not write to its pages. Reference counting still copies
+    # the pages a worker's requests touch, and after a lender change each
+    # worker compiles its own new copy; only the shared catalog file stays one
+    # copy for every worker.
+    gc.freeze()
 
-def match_credit_score(client_score, lender_requirement):
-    """Check if client's credit score meets lender's requirement."""
+def migrate_database():
+    """Bring an existing database's schema up to date, backfilling derived tables, before serving requests."""
+    if not os.path.exists(DATABASE_PATH):
+        return
     try:
-        client_score = int(''.join(c for c in client_score if c.isdigit()))
-        
-        # Extract minimum score from lender requirement
-        if '+' in lender_requirement:
-            # Format like "650+"
-            min_score = int(''.join(c for c in lender_requirement if c.isdigit()))
-            match_result = client_score >= min_score
-        elif '-' in lender_requirement:
-            # Format like "650-700"
-            parts = lender_requirement.split('-')
-            min_score = int(''.join(c for c in parts[0] if c.isdigit()))
-            max_score = int(''.join(c for c in parts[1] if c.isdigit()))
-            match_result = min_score <= client_score <= max_score
-        else:
-            # Just a number
-            min_score = int(''.join(c for c in lender_requirement if c.isdigit()))
-            match_result = client_score >= min_score
-        
-        reason = f"Client: {client_score}, Lender requires: {lender_requirement}"
-        
-        return match_result, reason
-    except:
-        return False, f"Could not parse credit score: Client: {client_score}, Lender: {lender_requirement}"
+        BrokerBuddyDB(DATABASE_PATH).create_tables()
+    except sqlite3.Error as e:
+        app.logger.error(f"Could not migrate database {DATABASE_PATH}: {e}")
+    finally:
+        # Connections must not cross a fork when gunicorn preloads the app
+        BrokerBuddyDB.close_pool()
+
+def find_matching_lenders(client_data, program_type=None, strict=False, limit=None, details=True):
+    """Find lenders that match the client criteria."""
+    db = get_db(readonly=True)
+    
+    # Match details need the compiled criteria; scores alone can come from the shared catalog
+    engine = get_scoring_engine(db) if not details else MatchingEngine(db.conn, get_lender_catalog(db))
+    matches = cached_matches(engine, client_data, program_type, strict, limit, details)
+    
+    db.close()
+    
+    return matches
+
+def cached_matches(engine, client_data, program_type=None, strict=False, limit=None, details=True):
+    """Return the engine's ranked matches for a client, reusing a cached list when possible."""
+    # The shared catalog has the same version and criterion names as the compiled one
+    catalog = engine.shared if engine.shared is not None else engine.get_catalog()
+    key = match_cache.make_key(client_data, catalog, program_type, strict, limit, details)
+    matches = match_cache.get(key)
+    if matches is None:
+        start = time.perf_counter()
+        scored = engine.lenders_scored
+        matches = engine.find_matching_lenders(client_data, program_type, strict, limit, details)
+        record_phase('match', time.perf_counter() - start)
+        record_phase('lenders_scored', engine.lenders_scored - scored)
+        match_cache.put(key, matches)
+        # Sampling times the compiled criteria, which workers scoring from the
+        # shared catalog do not build
+        if engine.shared is None and matcher_stats.should_sample():
+            catalog = engine.get_catalog()
+            matcher_stats.profile(catalog.select(program_type), ClientProfile(client_data, catalog))
+    return matches
+
+def save_matches(client_id, matches):
+    """Persist a client's matches, in the background when write-behind is enabled."""
+    if match_writer is not None and match_writer.submit(client_id, matches):
+        return True
+    
+    db = get_db()
+    saved = MatchingEngine(db.conn).save_match_results(client_id, matches)
+    db.close()
+    return saved
+
+# Runs on import, so once per gunicorn master with --preload or once per worker without
+migrate_database()
 
 # Run the application
 if __name__ == '__main__':
@@ -0,0 +1,16 @@
+"""
+BrokerBuddy Benchmarks
+
+Scripts for measuring the matching engine against synthetic lender catalogs
+that are much larger than the bundled database. Run them from the project root,
+for example: python -m benchmarks.bench_score_matrix
+
+bench_suite times the matching paths requests use, down to the compiled
+criterion checks of each kind, at several catalog sizes and writes JSON, so runs before and after a change can be compared:
+
+    python -m benchmarks.bench_suite --output before.json
+    python -m benchmarks.bench_suite --output after.json --compare before.json
+
+load_test runs the web application under concurrent simulated users and
+reports latency percentiles, throughput and error rate per page.
+"""
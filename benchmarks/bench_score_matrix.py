@@ -0,0 +1,62 @@
+"""
+Benchmark MatchingEngine.score_matrix against the per-client scalar loop.
+
+Usage:
+    python -m benchmarks.bench_score_matrix [clients] [lenders]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from matching_engine import MatchingEngine
+from lender_catalog import ClientProfile
+from benchmarks.synthetic import create_database, generate_clients
+
+# Number of clients scored with the scalar engine to estimate its total time
+SCALAR_SAMPLE = 200
+
+
+def main(client_count=10000, lender_count=1000):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = create_database(os.path.join(tmp, 'bench.db'), lender_count)
+        engine = MatchingEngine(sqlite3.connect(db_path))
+        clients = generate_clients(client_count)
+
+        start = time.perf_counter()
+        catalog = engine.get_catalog()
+        catalog.arrays()
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        lenders, scores = engine.score_matrix(clients)
+        matrix_seconds = time.perf_counter() - start
+
+        sample = clients[:SCALAR_SAMPLE]
+        start = time.perf_counter()
+        for client_data in sample:
+            engine.find_matching_lenders(client_data)
+        scalar_seconds = (time.perf_counter() - start) * client_count / len(sample)
+
+        # The vectorized scores must be identical to the scalar ones
+        mismatches = 0
+        for i, client_data in enumerate(sample):
+            client = ClientProfile(client_data)
+            for j, lender in enumerate(lenders):
+                if engine.score_lender(lender, client)[0] != scores[i, j]:
+                    mismatches += 1
+
+        print(f"Catalog: {len(lenders)} lenders, built in {build_seconds * 1000:.1f} ms")
+        print(f"score_matrix: {client_count} x {len(lenders)} in {matrix_seconds:.2f} s "
+              f"({client_count * len(lenders) / matrix_seconds:,.0f} pairs/s)")
+        print(f"Scalar loop (estimated from {len(sample)} clients): {scalar_seconds:.2f} s")
+        print(f"Speedup: {scalar_seconds / matrix_seconds:.1f}x, mismatches: {mismatches}")
+        return mismatches
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:3]]
+    sys.exit(1 if main(*args) else 0)
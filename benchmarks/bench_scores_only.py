@@ -0,0 +1,78 @@
+"""
+Benchmark the scores-only matching path against full match details.
+
+Measures, per find_matching_lenders call, the wall time, the number of memory
+blocks allocated and the peak traced memory, with and without match details.
+
+Usage:
+    python -m benchmarks.bench_scores_only [clients] [lenders]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from matching_engine import MatchingEngine
+from benchmarks.synthetic import create_database, generate_clients
+
+
+def measure(engine, clients, details):
+    """Return (seconds, allocated blocks, peak bytes) per request."""
+    start = time.perf_counter()
+    for client_data in clients:
+        engine.find_matching_lenders(client_data, details=details)
+    seconds = (time.perf_counter() - start) / len(clients)
+
+    blocks = 0
+    peak = 0
+    tracemalloc.start()
+    for client_data in clients:
+        tracemalloc.clear_traces()
+        tracemalloc.reset_peak()
+        before = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+        matches = engine.find_matching_lenders(client_data, details=details)
+        after = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+        blocks += after - before
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        del matches
+    tracemalloc.stop()
+
+    return seconds, blocks / len(clients), peak
+
+
+def main(client_count=200, lender_count=1000):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = create_database(os.path.join(tmp, 'bench.db'), lender_count)
+        engine = MatchingEngine(sqlite3.connect(db_path))
+        engine.get_catalog()
+        clients = generate_clients(client_count)
+
+        # Both paths must rank the same lenders with the same scores
+        mismatches = 0
+        for client_data in clients:
+            full = engine.find_matching_lenders(client_data)
+            scores = engine.find_matching_lenders(client_data, details=False)
+            if [(m['lender_id'], m['match_score']) for m in full] != \
+                    [(m['lender_id'], m['match_score']) for m in scores]:
+                mismatches += 1
+
+        full_seconds, full_blocks, full_peak = measure(engine, clients, True)
+        fast_seconds, fast_blocks, fast_peak = measure(engine, clients, False)
+
+        print(f"Catalog: {lender_count} lenders, {client_count} clients")
+        print(f"With details: {full_seconds * 1000:.2f} ms, {full_blocks:,.0f} live blocks, "
+              f"peak {full_peak / 1024:,.0f} KiB per request")
+        print(f"Scores only:  {fast_seconds * 1000:.2f} ms, {fast_blocks:,.0f} live blocks, "
+              f"peak {fast_peak / 1024:,.0f} KiB per request")
+        print(f"Saved: {1 - fast_peak / full_peak:.0%} of peak memory, "
+              f"{full_seconds / fast_seconds:.1f}x faster, mismatches: {mismatches}")
+        return mismatches
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:3]]
+    sys.exit(1 if main(*args) else 0)
@@ -0,0 +1,190 @@
+"""
+Time the matching engine's public methods against synthetic catalogs of
+increasing size and record the results as JSON.
+
+For each catalog size this measures building the compiled catalog,
+find_matching_lenders (with and without match details), calculate_match_score
+and CompiledCriterion.evaluate and test for every criterion kind, using lender
+criteria and clients from the synthetic generator. Passing a previous results file prints the change per operation.
+
+Usage:
+    python -m benchmarks.bench_suite [--sizes 10,1000,10000] [--clients 50]
+                                     [--output results.json] [--compare previous.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from matching_engine import MatchingEngine
+from lender_catalog import ClientProfile, CRITERION_KINDS
+from benchmarks.synthetic import create_database, generate_clients
+
+# Calls timed per operation for the cheap per-pair methods
+PAIR_SAMPLE = 2000
+
+
+def summarize(operation, lender_count, timings):
+    """Return the statistics for one operation's per-call timings in seconds."""
+    timings = sorted(timings)
+    return {
+        'operation': operation,
+        'lenders': lender_count,
+        'calls': len(timings),
+        'total_s': round(sum(timings), 6),
+        'mean_us': round(statistics.fmean(timings) * 1e6, 3),
+        'median_us': round(statistics.median(timings) * 1e6, 3),
+        'p95_us': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1e6, 3),
+        'min_us': round(timings[0] * 1e6, 3)
+    }
+
+
+def time_calls(function, arguments):
+    """Call a function once per argument tuple and return each call's duration."""
+    function(*arguments[0])  # Warm up
+    timings = []
+    for args in arguments:
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def criterion_pairs(catalog, profiles, rng):
+    """
+    Sample (criterion, client) pairs for each criterion kind.
+
+    Only pairs where the client has a value for the criterion are sampled,
+    since those are the only ones the matching engine evaluates.
+
+    Returns:
+        dict: Criterion kind -> list of (CompiledCriterion, ClientProfile) tuples
+    """
+    by_kind = {}
+    for lender in catalog:
+        for criterion in lender.criteria:
+            by_kind.setdefault(criterion.kind, []).append(criterion)
+
+    pairs = {}
+    for kind, criteria in sorted(by_kind.items()):
+        candidates = [(criterion, profile) for criterion in rng.sample(criteria, min(len(criteria), 200))
+                      for profile in profiles if profile.get(criterion.name)]
+        if candidates:
+            pairs[kind] = [rng.choice(candidates) for _ in range(PAIR_SAMPLE)]
+    return pairs
+
+
+def run_size(lender_count, client_count, seed):
+    """Benchmark every operation against one synthetic catalog size."""
+    results = []
+    rng = random.Random(seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = create_database(os.path.join(tmp, 'bench.db'), lender_count, seed)
+        conn = sqlite3.connect(db_path)
+        clients = generate_clients(client_count, seed)
+
+        engine = MatchingEngine(conn)
+        start = time.perf_counter()
+        catalog = engine.get_catalog()
+        results.append(summarize('build_catalog', lender_count, [time.perf_counter() - start]))
+
+        requests = [(client_data,) for client_data in clients]
+        results.append(summarize('find_matching_lenders', lender_count,
+                                 time_calls(engine.find_matching_lenders, requests)))
+        results.append(summarize('find_matching_lenders[details=False]', lender_count,
+                                 time_calls(lambda client_data: engine.find_matching_lenders(
+                                     client_data, details=False), requests)))
+
+        lender_ids = [lender.id for lender in catalog]
+        pairs = [(rng.choice(lender_ids), rng.choice(clients)) for _ in range(PAIR_SAMPLE)]
+        results.append(summarize('calculate_match_score', lender_count,
+                                 time_calls(engine.calculate_match_score, pairs)))
+
+        # The criterion checks find_matching_lenders runs per lender, with client
+        # values parsed once per client and restriction indexes built up front
+        # as in a warm worker
+        profiles = [ClientProfile(client_data, catalog) for client_data in clients]
+        for name in catalog.criterion_names:
+            if CRITERION_KINDS.get(name) == 'restriction':
+                catalog.restriction_index(name)
+        for kind, kind_pairs in criterion_pairs(catalog, profiles, rng).items():
+            results.append(summarize(f"evaluate[{kind}]", lender_count,
+                                     time_calls(lambda criterion, client: criterion.evaluate(client),
+                                                kind_pairs)))
+            results.append(summarize(f"test[{kind}]", lender_count,
+                                     time_calls(lambda criterion, client: criterion.test(client),
+                                                kind_pairs)))
+
+        conn.close()
+
+    return results
+
+
+def compare(results, previous):
+    """Print each operation's mean time relative to a previous run."""
+    before = {(entry['operation'], entry['lenders']): entry for entry in previous['results']}
+    print(f"{'operation':<40} {'lenders':>8} {'before us':>12} {'after us':>12} {'change':>8}")
+    for entry in results:
+        old = before.get((entry['operation'], entry['lenders']))
+        if old is None or not old['mean_us']:
+            continue
+        change = entry['mean_us'] / old['mean_us'] - 1
+        print(f"{entry['operation']:<40} {entry['lenders']:>8} {old['mean_us']:>12,.1f} "
+              f"{entry['mean_us']:>12,.1f} {change:>+8.1%}")
+
+
+def main(sizes=(10, 1000, 10000), client_count=50, seed=0, output=None, previous=None):
+    results = []
+    for lender_count in sizes:
+        start = time.perf_counter()
+        results.extend(run_size(lender_count, client_count, seed))
+        print(f"{lender_count} lenders done in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'seed': seed,
+        'clients': client_count,
+        'pair_sample': PAIR_SAMPLE,
+        'results': results
+    }
+
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if previous:
+        with open(previous) as f:
+            compare(results, json.load(f))
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the matching engine at several catalog sizes')
+    parser.add_argument('--sizes', default='10,1000,10000',
+                        help='Comma-separated lender counts (default: 10,1000,10000)')
+    parser.add_argument('--clients', type=int, default=50,
+                        help='Clients timed through find_matching_lenders per size (default: 50)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+    parser.add_argument('--compare', help='Previous JSON results to compare against')
+    args = parser.parse_args()
+
+    main([int(size) for size in args.sizes.split(',')], args.clients, args.seed, args.output, args.compare)
@@ -0,0 +1,338 @@
+"""
+Load-test the web application with concurrent simulated users.
+
+Starts wsgi:app locally (under gunicorn when it is installed, otherwise the
+Werkzeug threaded server) against a copy of the bundled database or a
+synthetic one, then runs virtual users that each keep their own session and
+repeatedly pick a scenario from a weighted mix:
+
+    results   POST /submit-client with a synthetic client profile, then GET /results
+    lender    GET /lender/<id> for a random lender
+    admin     GET /admin
+
+between which they pause for a random think time. Only results is in the
+default mix: the lender and admin pages need templates the repository does not
+ship yet, so they fail on every request. Latency percentiles, throughput and
+error rate per route are written as JSON. A route whose every request fails is
+reported as failed, left out of the run's totals, and makes the harness exit
+with status 1. With several
+--lenders values the run is repeated per catalog size, and the largest size
+whose /results p95 latency stays within --budget-ms is reported.
+
+Usage:
+    python -m benchmarks.load_test [--lenders 1000,5000,10000] [--users 10]
+                                   [--duration 30] [--think-time 0.5]
+                                   [--mix results=1]
+                                   [--budget-ms 500] [--output load.json]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_DIR)
+from benchmarks.synthetic import create_database, generate_client
+
+# Seconds to wait for the server to accept requests
+STARTUP_TIMEOUT = 60
+
+# Run when gunicorn is not installed
+WERKZEUG_SERVER = (
+    "import sys; from werkzeug.serving import run_simple; from wsgi import app; "
+    "run_simple('127.0.0.1', int(sys.argv[1]), app, threaded=True)"
+)
+
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of a sorted list."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values) + 0.5)) - 1))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    """The application running in a child process."""
+
+    def __init__(self, db_path, workers, log_path):
+        """
+        Start the server.
+
+        Args:
+            db_path (str): Database the application serves
+            workers (int): gunicorn worker processes
+            log_path (str): File the server's output is written to
+        """
+        self.port = free_port()
+        env = dict(os.environ, DATABASE_PATH=db_path)
+        try:
+            import gunicorn  # noqa: F401
+            command = [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', '4',
+                       '--bind', f"127.0.0.1:{self.port}", '--preload', 'wsgi:app']
+            self.kind = 'gunicorn'
+        except ImportError:
+            command = [sys.executable, '-c', WERKZEUG_SERVER, str(self.port)]
+            self.kind = 'werkzeug'
+
+        self.log = open(log_path, 'w')
+        self.process = subprocess.Popen(command, cwd=PROJECT_DIR, env=env,
+                                        stdout=self.log, stderr=subprocess.STDOUT)
+        self._wait_until_ready()
+
+    def _wait_until_ready(self):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with status {self.process.returncode}, "
+                                   f"see {self.log.name}")
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=5)
+                conn.request('GET', '/')
+                conn.getresponse().read()
+                conn.close()
+                return
+            except OSError:
+                time.sleep(0.1)
+        self.stop()
+        raise RuntimeError(f"Server did not start within {STARTUP_TIMEOUT} seconds")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.log.close()
+
+
+class VirtualUser(threading.Thread):
+    """One simulated user with its own connection and session cookie."""
+
+    def __init__(self, port, scenarios, lender_ids, think_time, stop_at, record, seed):
+        super().__init__(daemon=True)
+        self.port = port
+        self.scenarios = scenarios
+        self.lender_ids = lender_ids
+        self.think_time = think_time
+        self.stop_at = stop_at
+        self.record = record
+        self.rng = random.Random(seed)
+        self.cookie = None
+        self.conn = None
+
+    def request(self, route, method, path, body=None, expected=(200,)):
+        headers = {}
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        if body is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+        start = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+            status = response.status
+            cookie = response.getheader('Set-Cookie')
+            if cookie:
+                self.cookie = cookie.split(';', 1)[0]
+            if response.getheader('Connection', '').lower() == 'close':
+                self.conn.close()
+                self.conn = None
+        except (OSError, http.client.HTTPException):
+            status = None
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = None
+        self.record(route, time.perf_counter() - start, status in expected)
+
+    def run(self):
+        names = [name for name, weight in self.scenarios]
+        weights = [weight for name, weight in self.scenarios]
+        while time.monotonic() < self.stop_at:
+            scenario = self.rng.choices(names, weights)[0]
+            if scenario == 'results':
+                body = urlencode(generate_client(self.rng))
+                self.request('/submit-client', 'POST', '/submit-client', body, expected=(302,))
+                self.request('/results', 'GET', '/results')
+            elif scenario == 'lender':
+                self.request('/lender/<id>', 'GET', f"/lender/{self.rng.choice(self.lender_ids)}")
+            else:
+                self.request('/admin', 'GET', '/admin')
+
+            if self.think_time:
+                time.sleep(self.rng.uniform(0, 2 * self.think_time))
+
+
+def run_load(server, lender_ids, users, duration, warmup, think_time, scenarios, seed):
+    """Drive the server with virtual users and return per-route statistics."""
+    samples = {}
+    lock = threading.Lock()
+    recording = threading.Event()
+
+    def record(route, seconds, ok):
+        if recording.is_set():
+            with lock:
+                samples.setdefault(route, []).append((seconds, ok))
+
+    stop_at = time.monotonic() + warmup + duration
+    threads = [VirtualUser(server.port, scenarios, lender_ids, think_time, stop_at, record, seed + i)
+               for i in range(users)]
+    for thread in threads:
+        thread.start()
+
+    time.sleep(warmup)
+    recording.set()
+    start = time.monotonic()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    routes = {}
+    for route, route_samples in sorted(samples.items()):
+        latencies = sorted(seconds for seconds, ok in route_samples)
+        errors = sum(1 for seconds, ok in route_samples if not ok)
+        routes[route] = {
+            'failed': errors == len(route_samples),
+            'requests': len(route_samples),
+            'errors': errors,
+            'error_rate': round(errors / len(route_samples), 4),
+            'throughput_rps': round(len(route_samples) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'max_ms': round(latencies[-1] * 1000, 2)
+        }
+
+    # Routes that never succeed measure only how fast they fail, so they are
+    # kept out of the totals and reported separately
+    working = [route for route in routes.values() if not route['failed']]
+    total = sum(route['requests'] for route in working)
+    errors = sum(route['errors'] for route in working)
+    return {
+        'failed_routes': [name for name, route in routes.items() if route['failed']],
+        'seconds': round(elapsed, 2),
+        'requests': total,
+        'errors': errors,
+        'error_rate': round(errors / total, 4) if total else None,
+        'throughput_rps': round(total / elapsed, 2),
+        'routes': routes
+    }
+
+
+def lender_ids_in(db_path):
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    ids = [lender_id for (lender_id,) in conn.execute("SELECT id FROM lenders")]
+    conn.close()
+    return ids
+
+
+def main(lender_counts=(None,), users=10, duration=30, warmup=5, think_time=0.5,
+         scenarios=(('results', 1),), workers=2, budget_ms=500,
+         seed=0, output=None):
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for lender_count in lender_counts:
+            db_path = os.path.join(tmp, f"load_{lender_count or 'bundled'}.db")
+            if lender_count is None:
+                shutil.copy2(os.path.join(PROJECT_DIR, 'brokerbuddy.db'), db_path)
+            else:
+                create_database(db_path, lender_count, seed)
+            lender_ids = lender_ids_in(db_path)
+
+            server = Server(db_path, workers, os.path.join(tmp, 'server.log'))
+            try:
+                result = run_load(server, lender_ids, users, duration, warmup, think_time,
+                                  scenarios, seed)
+            finally:
+                server.stop()
+
+            result = dict(lenders=len(lender_ids), server=server.kind, **result)
+            runs.append(result)
+            results_page = result['routes'].get('/results', {})
+            print(f"{len(lender_ids)} lenders: {result['throughput_rps']} req/s, "
+                  f"/results p95 {results_page.get('p95_ms')} ms, "
+                  f"error rate {result['error_rate']}", file=sys.stderr)
+            for route in result['failed_routes']:
+                print(f"ERROR: every {route} request failed with {len(lender_ids)} lenders; "
+                      f"see the server log", file=sys.stderr)
+
+    within_budget = []
+    for run in runs:
+        results_page = run['routes'].get('/results')
+        if (results_page and not run['failed_routes'] and not results_page['errors']
+                and results_page['p95_ms'] <= budget_ms):
+            within_budget.append(run['lenders'])
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'users': users,
+        'duration_s': duration,
+        'warmup_s': warmup,
+        'think_time_s': think_time,
+        'mix': dict(scenarios),
+        'workers': workers,
+        'budget_ms': budget_ms,
+        'max_lenders_within_budget': max(within_budget) if within_budget else None,
+        'failed_routes': sorted({route for run in runs for route in run['failed_routes']}),
+        'runs': runs
+    }
+
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load-test the BrokerBuddy web application')
+    parser.add_argument('--lenders', help='Comma-separated synthetic lender counts; '
+                                          'the bundled database is used when omitted')
+    parser.add_argument('--users', type=int, default=10, help='Concurrent virtual users (default: 10)')
+    parser.add_argument('--duration', type=float, default=30, help='Measured seconds per run (default: 30)')
+    parser.add_argument('--warmup', type=float, default=5, help='Unmeasured seconds first (default: 5)')
+    parser.add_argument('--think-time', type=float, default=0.5,
+                        help='Mean pause between a user\'s scenarios in seconds (default: 0.5)')
+    parser.add_argument('--mix', default='results=1',
+                        help='Scenario weights, e.g. results=6,lender=3,admin=1 (default: results=1)')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers (default: 2)')
+    parser.add_argument('--budget-ms', type=float, default=500,
+                        help='/results p95 latency budget in milliseconds (default: 500)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    lender_counts = [int(count) for count in args.lenders.split(',')] if args.lenders else [None]
+    scenarios = []
+    for item in args.mix.split(','):
+        name, weight = item.split('=')
+        if name not in ('results', 'lender', 'admin'):
+            parser.error(f"Unknown scenario {name}")
+        scenarios.append((name, float(weight)))
+
+    report = main(lender_counts, args.users, args.duration, args.warmup, args.think_time, scenarios,
+                  args.workers, args.budget_ms, args.seed, args.output)
+    if report['failed_routes']:
+        sys.exit(1)
@@ -0,0 +1,183 @@
+"""
+BrokerBuddy Synthetic Data
+
+This module generates realistic synthetic lenders and clients for benchmarks.
+Criteria values use the same free-text formats found in the lender spreadsheet,
+including a small share of values the parsers cannot handle.
+"""
+
+import os
+import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database_schema import BrokerBuddyDB
+
+INDUSTRIES = [
+    'Adult Entertainment', 'Agriculture', 'Amusement', 'Automotive Dealerships', 'Banking',
+    'Bus and Limo Services', 'Cannabis', 'Churches', 'Construction', 'Crypto', 'Firearms',
+    'Forestry', 'Gaming', 'Gyms', 'Logging', 'Marijuana', 'Massage Therapy', 'Med-Spas',
+    'Mining', 'Nail Salons', 'Oil & Gas', 'Pharmaceuticals', 'Racing', 'Restaurants',
+    'Salons', 'Software', 'Tanning', 'Towing', 'Transportation', 'Trucking', 'Vending',
+    'Virtual Currency', 'Landscaping', 'Manufacturing', 'Medical', 'Dental', 'Printing'
+]
+
+EQUIPMENT = [
+    'Aircraft', 'ATM Machines', 'Boats', 'Copiers', 'Excavator', 'Food Trucks', 'Furniture',
+    'Gas Pumps', 'Glider Kits', 'Golf Simulators', 'Injection Molds', 'Kiosks', 'Lasers',
+    'Servers', 'Signage', 'Sleepers', 'Software', 'Solar Panels', 'Tanning Beds',
+    'Vending Machines', 'Dump Truck', 'Forklift', 'CNC Machine', 'Skid Steer', 'Tractor'
+]
+
+STATES = [
+    'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'DC', 'FL', 'GA', 'HI', 'ID', 'IL', 'IN',
+    'IA', 'KS', 'KY', 'LA', 'ME', 'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH',
+    'NJ', 'NM', 'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT',
+    'VT', 'VA', 'WA', 'WV', 'WI', 'WY'
+]
+
+STATE_NAMES = ['California', 'Louisiana', 'South Dakota', 'North Dakota', 'Alaska', 'Hawaii',
+               'Vermont', 'Rhode Island', 'Nevada']
+
+PROGRAM_TYPES = ['App Only', 'Full Financials']
+
+
+def _amount_range(rng):
+    low = rng.choice([5, 10, 15, 20, 25, 30, 50])
+    high = rng.choice([100, 150, 175, 250, 350, 500, 1000])
+    return rng.choice([
+        f"${low}k-${high}k",
+        f"{low}k - {high}k",
+        f"{low}k-{high}k",
+        f"${low * 1000:,}-${high * 1000:,}",
+        f"${low}k to ${high}k"  # Not parseable, as in the real spreadsheet
+    ])
+
+
+def _time_in_business(rng):
+    years = rng.choice([1, 2, 2, 2, 3, 5])
+    return rng.choice([f"{years}+", f"{years}+ years", f"{years}+ Full Years",
+                       f"Full {years}+ years", f"{years * 12} months"])
+
+
+def _credit(rng):
+    score = rng.choice([550, 590, 600, 610, 620, 625, 640, 650, 675, 700])
+    return rng.choice([f"{score}+", f"{score}+", f"{score} +", f"{score}-{score + 100}",
+                       f"{score}", f"{score}+ Sweet spot of {score + 20}+"])
+
+
+def _collateral_age(rng):
+    years = rng.choice([5, 7, 10, 15, 20])
+    return rng.choice([f"<{years} years", f"{years} year", f"Titled <{years} years/150k miles",
+                       "No requirements", "New or Used"])
+
+
+def _restricted(rng, values, low, high):
+    return ', '.join(rng.sample(values, rng.randint(low, high)))
+
+
+def _states(rng):
+    choice = rng.random()
+    if choice < 0.4:
+        return None
+    if choice < 0.7:
+        return ', '.join(rng.sample(STATES, rng.randint(1, 6)))
+    return ', '.join(rng.sample(STATE_NAMES, rng.randint(1, 3)))
+
+
+def generate_lender_criteria(rng):
+    """
+    Generate the criteria values for one synthetic lender.
+
+    Args:
+        rng (random.Random): Random number generator
+
+    Returns:
+        dict: Criteria category name to free-text value
+    """
+    criteria = {
+        'amount_considered': _amount_range(rng),
+        'time_in_business': _time_in_business(rng),
+        'personal_credit': _credit(rng),
+        'bank_statements': rng.choice(['3 months', '6 months', '3 months most recent']),
+        'collateral_age': _collateral_age(rng),
+        'titled_vehicles': rng.choice(['Yes', 'No', 'Yes, case by case']),
+        'restricted_industries': _restricted(rng, INDUSTRIES, 2, 12),
+        'restricted_equipment': _restricted(rng, EQUIPMENT, 1, 10),
+        'state_restrictions': _states(rng),
+        'startups': rng.choice(['No', 'Yes', 'Yes with 700+ credit']),
+        'paynet': rng.choice([None, '650+', 'Yes']),
+        'business_credit': rng.choice([None, '70 Paydex', '640+', 'N/A'])
+    }
+    return {name: value for name, value in criteria.items() if value is not None}
+
+
+def generate_client(rng):
+    """
+    Generate one synthetic client profile as submitted by the client form.
+
+    Args:
+        rng (random.Random): Random number generator
+
+    Returns:
+        dict: Client data
+    """
+    return {
+        'client_name': f"Client {rng.randint(1, 10 ** 6)}",
+        'amount_considered': f"${rng.randrange(5000, 600000, 500):,}",
+        'time_in_business': rng.choice([f"{rng.randint(1, 20)} years", f"{rng.randint(3, 36)} months"]),
+        'personal_credit': rng.choice(['550-599', '600-649', '650-699', '700-749', '750+']),
+        'bank_statements': rng.choice(['3 months', '6 months', '12 months', 'None', '']),
+        'collateral_age': rng.choice([f"{rng.randint(0, 25)} years", '']),
+        'titled_vehicles': rng.choice(['Yes', 'No', '']),
+        'restricted_industries': rng.choice(INDUSTRIES),
+        'restricted_equipment': rng.choice(EQUIPMENT),
+        'state_restrictions': rng.choice(STATES),
+        'startups': rng.choice(['Yes', 'No', ''])
+    }
+
+
+def generate_clients(count, seed=0):
+    """Generate a list of synthetic client profiles."""
+    rng = random.Random(seed)
+    return [generate_client(rng) for _ in range(count)]
+
+
+def create_database(db_path, lender_count, seed=0):
+    """
+    Create a BrokerBuddy database populated with synthetic lenders.
+
+    Args:
+        db_path (str): Path of the SQLite database to create
+        lender_count (int): Number of lenders to generate
+        seed (int): Random seed, so runs are comparable
+
+    Returns:
+        str: The database path
+    """
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    db = BrokerBuddyDB(db_path)
+    db.initialize_database()
+    db.connect()
+
+    db.cursor.execute("SELECT id, name FROM criteria_categories")
+    categories = {row['name']: row['id'] for row in db.cursor.fetchall()}
+
+    rng = random.Random(seed)
+    for i in range(lender_count):
+        db.cursor.execute(
+            "INSERT INTO lenders (name, program_type) VALUES (?, ?)",
+            (f"Lender {i:05d}", rng.choice(PROGRAM_TYPES))
+        )
+        lender_id = db.cursor.lastrowid
+        db.cursor.executemany(
+            "INSERT INTO lender_criteria (lender_id, category_id, value) VALUES (?, ?, ?)",
+            [(lender_id, categories[name], value)
+             for name, value in generate_lender_criteria(rng).items()]
+        )
+
+    db.conn.commit()
+    db.close()
+    return db_path
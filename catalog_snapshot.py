@@ -0,0 +1,184 @@
+"""
+BrokerBuddy Catalog Snapshot
+
+This module reads and writes lender catalog snapshots: the criteria categories,
+lenders and lender criteria tables stored column by column in a compact binary
+file with a SHA-256 checksum. A snapshot can be loaded into a fresh database in
+milliseconds, using only the standard library.
+
+File layout (all integers little-endian):
+
+    header   magic "BBCS", format version (u16), reserved (u16),
+             catalog version (u64), column count (u32), SHA-256 of the body
+    body     one block per column: name length (u16), name (UTF-8),
+             type (u8, "i" or "s"), row count (u32), then
+               "i": row count int64 values
+               "s": a NULL bitmap of (row count + 7) // 8 bytes (bit set for
+                    NULL, least significant bit first), row count + 1 uint32
+                    offsets, then the UTF-8 text they index
+"""
+
+import hashlib
+import os
+import struct
+import sys
+from array import array
+
+MAGIC = b'BBCS'
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<4sHHQI32s')
+
+# Tables in a snapshot, with their columns and column types, in load order
+SNAPSHOT_TABLES = {
+    'criteria_categories': (('id', 'i'), ('name', 's'), ('description', 's')),
+    'lenders': (('id', 'i'), ('name', 's'), ('program_type', 's')),
+    'lender_criteria': (('lender_id', 'i'), ('category_id', 'i'), ('value', 's'))
+}
+
+
+def _int_column(values):
+    column = array('q', values)
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column.tobytes()
+
+
+def _str_column(values):
+    nulls = bytearray((len(values) + 7) // 8)
+    offsets = array('I', [0])
+    chunks = []
+    size = 0
+    for row, value in enumerate(values):
+        if value is None:
+            nulls[row // 8] |= 1 << (row % 8)
+            encoded = b''
+        else:
+            encoded = value.encode('utf-8')
+        chunks.append(encoded)
+        size += len(encoded)
+        offsets.append(size)
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+    return bytes(nulls) + offsets.tobytes() + b''.join(chunks)
+
+
+def _take(body, offset, length):
+    # The next `length` bytes of the body, refusing to read past its end
+    if offset + length > len(body):
+        raise ValueError("truncated column data")
+    return body[offset:offset + length], offset + length
+
+
+def _read_columns(body, column_count):
+    columns = {}
+    offset = 0
+    for _ in range(column_count):
+        data, offset = _take(body, offset, 2)
+        (name_length,) = struct.unpack('<H', data)
+        data, offset = _take(body, offset, name_length)
+        name = bytes(data).decode('utf-8')
+        data, offset = _take(body, offset, 5)
+        column_type, count = struct.unpack('<cI', data)
+
+        if column_type == b'i':
+            data, offset = _take(body, offset, count * 8)
+            values = array('q')
+            values.frombytes(data)
+            if sys.byteorder != 'little':
+                values.byteswap()
+            columns[name] = values.tolist()
+        elif column_type == b's':
+            nulls, offset = _take(body, offset, (count + 7) // 8)
+            data, offset = _take(body, offset, (count + 1) * 4)
+            offsets = array('I')
+            offsets.frombytes(data)
+            if sys.byteorder != 'little':
+                offsets.byteswap()
+            if offsets[0] != 0 or any(offsets[i] > offsets[i + 1] for i in range(count)):
+                raise ValueError(f"invalid text offsets in column {name}")
+            text, offset = _take(body, offset, offsets[-1])
+            text = bytes(text)
+            columns[name] = [None if nulls[i // 8] >> (i % 8) & 1
+                             else text[offsets[i]:offsets[i + 1]].decode('utf-8')
+                             for i in range(count)]
+        else:
+            raise ValueError(f"unknown type {column_type!r} for column {name}")
+
+    if offset != len(body):
+        raise ValueError("unexpected data after the last column")
+    return columns
+
+
+def write_snapshot(path, tables, catalog_version=0):
+    """
+    Write a catalog snapshot, replacing any existing file atomically.
+
+    Args:
+        path (str): Snapshot file path
+        tables (dict): Table name -> list of row tuples, in SNAPSHOT_TABLES column order
+        catalog_version (int): Lender catalog version the snapshot was taken at
+    """
+    blocks = []
+    for table, columns in SNAPSHOT_TABLES.items():
+        rows = tables.get(table, [])
+        for position, (column, column_type) in enumerate(columns):
+            values = [row[position] for row in rows]
+            name = f"{table}.{column}".encode('utf-8')
+            data = _int_column(values) if column_type == 'i' else _str_column(values)
+            blocks.append(struct.pack('<H', len(name)) + name +
+                          struct.pack('<cI', column_type.encode('ascii'), len(values)) + data)
+
+    body = b''.join(blocks)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, catalog_version, len(blocks),
+                         hashlib.sha256(body).digest())
+
+    temp_path = f"{path}.tmp{os.getpid()}"
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        f.write(body)
+    os.replace(temp_path, path)
+
+
+def read_snapshot(path):
+    """
+    Read and verify a catalog snapshot.
+
+    Args:
+        path (str): Snapshot file path
+
+    Returns:
+        tuple: (catalog_version, tables) where tables maps each table name to a
+            list of row tuples in SNAPSHOT_TABLES column order
+
+    Raises:
+        ValueError: If the file is not a snapshot, has an unsupported format
+            version, fails its checksum or is malformed
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a catalog snapshot")
+    magic, format_version, _, catalog_version, column_count, checksum = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a catalog snapshot")
+    if format_version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported catalog snapshot format version {format_version}")
+
+    body = memoryview(data)[HEADER.size:]
+    if hashlib.sha256(body).digest() != checksum:
+        raise ValueError(f"Catalog snapshot {path} is corrupt (checksum mismatch)")
+
+    try:
+        columns = _read_columns(body, column_count)
+    except (ValueError, struct.error) as e:
+        # UnicodeDecodeError is a ValueError too
+        raise ValueError(f"Catalog snapshot {path} is malformed: {e}") from e
+
+    tables = {}
+    for table, table_columns in SNAPSHOT_TABLES.items():
+        values = [columns.get(f"{table}.{column}") for column, column_type in table_columns]
+        if any(column is None for column in values) or len({len(column) for column in values}) > 1:
+            raise ValueError(f"Catalog snapshot {path} is malformed: incomplete table {table}")
+        tables[table] = list(zip(*values))
+    return catalog_version, tables
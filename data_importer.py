@@ -4,14 +4,69 @@ BrokerBuddy Data Importer
 This module handles importing lender data from the Excel spreadsheet into the database.
 """
 
-import pandas as pd
 import sqlite3
 import os
 import json
+import time
+import hashlib
 from datetime import datetime
 import sys
 sys.path.append('/home/ubuntu/brokerbuddy')
 from database_schema import BrokerBuddyDB
+from lender_catalog import CompiledCriterion
+from catalog_snapshot import SNAPSHOT_TABLES, read_snapshot, write_snapshot
+
+# Spreadsheet row labels mapped to database category names, per sheet
+APP_ONLY_CRITERIA = {
+    'Amount considered': 'amount_considered',
+    'Time in Business': 'time_in_business',
+    'Start-ups ': 'startups',
+    'Personal Credit': 'personal_credit',
+    'Paynet': 'paynet',
+    'Bank Statements': 'bank_statements',
+    'Collateral Age': 'collateral_age',
+    'Specialialty Products': 'special_products',
+    'Titled Vehicles': 'titled_vehicles',
+    'Restricted Industries': 'restricted_industries',
+    'Restricted Equipment': 'restricted_equipment',
+    'State Restrictions': 'state_restrictions',
+    'Cost of Funds Ranges': 'cost_of_funds',
+    'Max Commision': 'max_commission',
+    'Syndicator\'s Notes': 'syndicator_notes',
+    'Disclosure Requirements': 'disclosure_requirements'
+}
+
+FULL_FINANCIALS_CRITERIA = {
+    'Amount considered': 'amount_considered',
+    'Personal Credit': 'personal_credit',
+    'Business Credit': 'business_credit',
+    'Bank Statements': 'bank_statements',
+    'Collateral Age': 'collateral_age',
+    'Special deals': 'special_deals',
+    'Titled Vehicles': 'titled_vehicles',
+    'Time in Business': 'time_in_business',
+    'Start-ups ': 'startups',
+    'Special Industries': 'special_products',
+    'Restricted Industries': 'restricted_industries',
+    'Restricted Equipment': 'restricted_equipment',
+    'State Restrictions': 'state_restrictions',
+    'Cost of Fund': 'cost_of_funds',
+    'Max Commision': 'max_commission',
+    'Syndicator\'s Notes': 'syndicator_notes',
+    'Disclosure Requirements': 'disclosure_requirements'
+}
+
+# Cell text treated as empty, the same strings pandas.read_excel reads as missing
+NA_VALUES = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+})
+
+# (sheet name, program type, criteria labels, columns before the first lender), in import order
+SHEETS = (
+    ('App Only', 'App Only', APP_ONLY_CRITERIA, 1),
+    ('Full Financials', 'Full Financials', FULL_FINANCIALS_CRITERIA, 2)
+)
 
 class LenderDataImporter:
     def __init__(self, excel_file, db_path='/home/ubuntu/brokerbuddy/brokerbuddy.db'):
@@ -20,241 +75,402 @@ class LenderDataImporter:
         self.db = BrokerBuddyDB(db_path)
         
     def import_data(self):
-        """Import all lender data from the Excel file into the database."""
+        """
+        Import all lender data from the Excel file into the database.
+        
+        The workbook is read once, then every change is written in a single
+        transaction, so a failure leaves the database unchanged. Lenders whose
+        spreadsheet column has not changed since the last import are skipped,
+        and only the criteria cells that differ are written.
+        """
         # Initialize the database
         self.db.initialize_database()
         
-        # Import data from both sheets
-        self.import_app_only_data()
-        self.import_full_financials_data()
+        start = time.perf_counter()
+        try:
+            sheets = self.read_workbook()
+        except Exception as e:
+            print(f"Error reading {self.excel_file}: {e}")
+            return {"status": "error", "message": f"Could not read spreadsheet: {e}"}
+        read_seconds = time.perf_counter() - start
         
-        return {"status": "success", "message": "Lender data imported successfully"}
-    
-    def import_app_only_data(self):
-        """Import data from the 'App Only' sheet."""
+        lenders = self._merge_sheets(sheets)
+        cell_count = sum(len(criteria) for program_type, criteria, covered in lenders.values())
+        
+        self.db.connect()
         try:
-            # Read the App Only sheet
-            app_only_df = pd.read_excel(self.excel_file, sheet_name='App Only')
+            self.db.conn.execute("BEGIN IMMEDIATE")
+            diff, changed_ids = self._apply_changes(lenders)
             
-            # Connect to the database
-            self.db.connect()
-            
-            # Get criteria categories from database
-            self.db.cursor.execute("SELECT id, name FROM criteria_categories")
-            categories = {row['name']: row['id'] for row in self.db.cursor.fetchall()}
+            # Refresh the typed lender profiles and let running applications know the lender data changed
+            if changed_ids:
+                self.db.refresh_lender_profiles(changed_ids)
+                self.db.bump_catalog_version()
+            self.db.conn.commit()
+        except Exception as e:
+            self.db.conn.rollback()
+            self.db.close()
+            print(f"Error importing lender data, no changes were made: {e}")
+            return {"status": "error", "message": f"Import failed and was rolled back: {e}"}
+        
+        seconds = time.perf_counter() - start
+        unparsed_states = self._find_unparsed_state_restrictions()
+        self.db.close()
+        
+        self._print_diff(diff)
+        print(f"Read {len(lenders)} lenders and {cell_count} criteria in {seconds:.2f} s "
+              f"(read {read_seconds:.2f} s, {cell_count / seconds:,.0f} rows/s), "
+              f"wrote {diff['criteria_written']} criteria")
+        
+        return {
+            "status": "success",
+            "message": "Lender data imported successfully",
+            "lenders": len(lenders),
+            "criteria": cell_count,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(cell_count / seconds) if seconds else None,
+            "diff": diff,
+            "unparsed_state_restrictions": unparsed_states
+        }
+    
+    def read_workbook(self):
+        """
+        Read every lender from both sheets in one pass over the workbook.
+        
+        The workbook is opened in openpyxl's read-only mode, which streams rows
+        instead of loading whole sheets into memory.
+        
+        Returns:
+            list: (program_type, lenders, categories) per sheet, where lenders maps
+                each lender name to a dictionary of criteria category -> value and
+                categories is the set of categories the sheet has a row for
+        """
+        # Only needed for spreadsheets, so boxes that load snapshots do not need it
+        from openpyxl import load_workbook
+        
+        workbook = load_workbook(self.excel_file, read_only=True, data_only=True)
+        try:
+            return [(program_type,) + self._read_sheet(workbook[sheet_name], criteria_labels, first_column)
+                    for sheet_name, program_type, criteria_labels, first_column in SHEETS]
+        finally:
+            workbook.close()
+    
+    def _read_sheet(self, worksheet, criteria_labels, first_column):
+        """Read one sheet: lender names across the header row, one criterion per labelled row."""
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, ())
+        
+        # Lender columns, named the way pandas names them: blank headers become
+        # "Unnamed: <column>" and repeated names get a ".<n>" suffix
+        lender_columns = []
+        seen = {}
+        for column, name in enumerate(header):
+            name = f"Unnamed: {column}" if name is None else str(name)
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}.{seen[name]}"
+            else:
+                seen[name] = 0
+            if column >= first_column:
+                lender_columns.append((column, name))
+        
+        lenders = {name: {} for column, name in lender_columns}
+        categories = set()
+        for row in rows:
+            if not row:
+                continue
+            category = criteria_labels.get(row[0])
+            if category is None:
+                continue
+            categories.add(category)
             
-            # Map spreadsheet rows to criteria categories
-            criteria_mapping = self._get_app_only_criteria_mapping(app_only_df)
+            # A label that appears twice keeps the values from its last row
+            for column, name in lender_columns:
+                value = row[column] if column < len(row) else None
+                if value is None or (isinstance(value, str) and value in NA_VALUES):
+                    lenders[name].pop(category, None)
+                else:
+                    lenders[name][category] = str(value)
+        
+        return lenders, categories
+    
+    def _merge_sheets(self, sheets):
+        """
+        Combine the sheets into the state each lender should be in.
+        
+        A lender listed on both sheets keeps the program type of the first and
+        takes its criteria from both, the later sheet winning.
+        
+        Returns:
+            dict: Lender name -> (program_type, criteria, categories covered by its sheets)
+        """
+        lenders = {}
+        for program_type, sheet_lenders, categories in sheets:
+            for name, criteria in sheet_lenders.items():
+                if name not in lenders:
+                    lenders[name] = (program_type, {}, set())
+                lenders[name][1].update(criteria)
+                lenders[name][2].update(categories)
+        return lenders
+    
+    @staticmethod
+    def fingerprint(program_type, criteria, covered):
+        """Return a content hash of a lender's spreadsheet column."""
+        payload = json.dumps([program_type, sorted(criteria.items()), sorted(covered)],
+                             separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _apply_changes(self, lenders):
+        """
+        Write the differences between the spreadsheet and the database. The caller commits.
+        
+        Criteria cells that are blank in the spreadsheet are removed from the
+        lender. Lenders that are no longer in the spreadsheet are reported but
+        left in the database.
+        
+        Returns:
+            tuple: (diff report, IDs of the lenders whose criteria were written)
+        """
+        cursor = self.db.cursor
+        cursor.execute("SELECT id, name FROM criteria_categories")
+        categories = {row['name']: row['id'] for row in cursor.fetchall()}
+        cursor.execute("SELECT id, name FROM lenders")
+        lender_ids = {row['name']: row['id'] for row in cursor.fetchall()}
+        cursor.execute("""
+            SELECT f.lender_id, f.content_hash, l.name
+            FROM lender_fingerprints f
+            JOIN lenders l ON f.lender_id = l.id
+        """)
+        fingerprints = {row['lender_id']: (row['content_hash'], row['name']) for row in cursor.fetchall()}
+        
+        diff = {'added': [], 'changed': {}, 'removed': [], 'unchanged': 0, 'criteria_written': 0}
+        
+        # Lenders whose column changed since the last import, or that have no fingerprint yet
+        pending = {}
+        for name, (program_type, criteria, covered) in lenders.items():
+            criteria = {category: value for category, value in criteria.items() if category in categories}
+            content_hash = self.fingerprint(program_type, criteria, covered)
+            lender_id = lender_ids.get(name)
+            if lender_id is not None and fingerprints.get(lender_id, (None,))[0] == content_hash:
+                diff['unchanged'] += 1
+                continue
+            pending[name] = (program_type, criteria, covered, content_hash)
+        
+        new_lenders = [(name, entry[0]) for name, entry in pending.items() if name not in lender_ids]
+        new_names = {name for name, program_type in new_lenders}
+        cursor.executemany("INSERT INTO lenders (name, program_type) VALUES (?, ?)", new_lenders)
+        if new_lenders:
+            cursor.execute("SELECT id, name FROM lenders WHERE name IN (SELECT value FROM json_each(?))",
+                           (json.dumps([name for name, program_type in new_lenders]),))
+            lender_ids.update((row['name'], row['id']) for row in cursor.fetchall())
+        
+        # Current criteria of every pending lender, in one query
+        current = {lender_ids[name]: {} for name in pending}
+        cursor.execute("""
+            SELECT lc.lender_id, c.name, lc.value
+            FROM lender_criteria lc
+            JOIN criteria_categories c ON lc.category_id = c.id
+            WHERE lc.lender_id IN (SELECT value FROM json_each(?))
+        """, (json.dumps(list(current)),))
+        for row in cursor.fetchall():
+            current[row['lender_id']][row['name']] = row['value']
+        
+        writes = []
+        deletes = []
+        changed_ids = []
+        for name, (program_type, criteria, covered, content_hash) in pending.items():
+            lender_id = lender_ids[name]
+            existing = current[lender_id]
+            added = sorted(category for category in criteria if category not in existing)
+            changed = sorted(category for category in criteria
+                             if category in existing and existing[category] != criteria[category])
+            removed = sorted(category for category in covered
+                             if category in categories and existing.get(category) and category not in criteria)
             
-            # Get lender columns (skip the first column which contains criteria names)
-            lender_columns = [col for col in app_only_df.columns if col != 'APP-ONLY Programs' and pd.notna(col)]
+            writes.extend((lender_id, categories[category], criteria[category]) for category in added + changed)
+            deletes.extend((lender_id, categories[category]) for category in removed)
             
-            # Process each lender
-            for lender_name in lender_columns:
-                # Insert lender
+            if name not in new_names and not (added or changed or removed):
+                continue
+            changed_ids.append(lender_id)
+            if name in new_names:
+                diff['added'].append(name)
+            else:
+                diff['changed'][name] = {'added': added, 'changed': changed, 'removed': removed}
+        
+        cursor.executemany("""
+            INSERT OR REPLACE INTO lender_criteria 
+            (lender_id, category_id, value, updated_at) 
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        """, writes)
+        cursor.executemany("DELETE FROM lender_criteria WHERE lender_id = ? AND category_id = ?", deletes)
+        cursor.executemany("UPDATE lenders SET updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                           [(lender_ids[name],) for name in diff['changed']])
+        cursor.executemany("""
+            INSERT OR REPLACE INTO lender_fingerprints (lender_id, content_hash, imported_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+        """, [(lender_ids[name], entry[3]) for name, entry in pending.items()])
+        
+        # Lenders imported before that are no longer in the spreadsheet
+        gone = [(lender_id, name) for lender_id, (content_hash, name) in fingerprints.items()
+                if name not in lenders]
+        diff['removed'] = sorted(name for lender_id, name in gone)
+        cursor.executemany("DELETE FROM lender_fingerprints WHERE lender_id = ?",
+                           [(lender_id,) for lender_id, name in gone])
+        
+        diff['criteria_written'] = len(writes) + len(deletes)
+        return diff, changed_ids
+    
+    def _print_diff(self, diff):
+        """Print the import diff report."""
+        for name in diff['added']:
+            print(f"Added lender: {name}")
+        for name, criteria in diff['changed'].items():
+            changes = [f"{label} {', '.join(criteria[key])}"
+                       for key, label in (('added', 'added'), ('changed', 'changed'), ('removed', 'removed'))
+                       if criteria[key]]
+            print(f"Changed lender: {name} ({'; '.join(changes)})")
+        for name in diff['removed']:
+            print(f"Lender no longer in the spreadsheet (left in the database): {name}")
+        print(f"{len(diff['added'])} added, {len(diff['changed'])} changed, "
+              f"{len(diff['removed'])} removed, {diff['unchanged']} unchanged lenders")
+    
+    def export_snapshot(self, snapshot_path):
+        """
+        Write the lender data in the database to a catalog snapshot file.
+        
+        Args:
+            snapshot_path (str): Path of the snapshot file to write
+        
+        Returns:
+            dict: Import-style status with the number of lenders and criteria written
+        """
+        self.db.connect()
+        try:
+            tables = {}
+            for table, columns in SNAPSHOT_TABLES.items():
                 self.db.cursor.execute(
-                    "INSERT OR IGNORE INTO lenders (name, program_type) VALUES (?, ?)",
-                    (lender_name, 'App Only')
+                    f"SELECT {', '.join(column for column, column_type in columns)} FROM {table} ORDER BY rowid"
                 )
-                self.db.conn.commit()
-                
-                # Get lender ID
-                self.db.cursor.execute("SELECT id FROM lenders WHERE name = ?", (lender_name,))
-                lender_id = self.db.cursor.fetchone()['id']
-                
-                # Process each criterion for this lender
-                for criterion_name, row_index in criteria_mapping.items():
-                    if criterion_name in categories:
-                        category_id = categories[criterion_name]
-                        
-                        # Get the value for this lender and criterion
-                        value = app_only_df.iloc[row_index, app_only_df.columns.get_loc(lender_name)]
-                        
-                        # Skip if value is NaN
-                        if pd.isna(value):
-                            continue
-                            
-                        # Convert value to string
-                        value_str = str(value)
-                        
-                        # Insert or update lender criterion
-                        self.db.cursor.execute("""
-                            INSERT OR REPLACE INTO lender_criteria 
-                            (lender_id, category_id, value, updated_at) 
-                            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-                        """, (lender_id, category_id, value_str))
-            
-            self.db.conn.commit()
-            
-        except Exception as e:
-            print(f"Error importing App Only data: {e}")
-            if self.db.conn:
-                self.db.conn.rollback()
+                tables[table] = [tuple(row) for row in self.db.cursor.fetchall()]
+            catalog_version = self.db.get_catalog_version()
         finally:
             self.db.close()
+        
+        write_snapshot(snapshot_path, tables, catalog_version)
+        
+        return {
+            "status": "success",
+            "message": f"Lender data exported to {snapshot_path}",
+            "lenders": len(tables['lenders']),
+            "criteria": len(tables['lender_criteria'])
+        }
     
-    def import_full_financials_data(self):
-        """Import data from the 'Full Financials' sheet."""
+    def load_snapshot(self, snapshot_path):
+        """
+        Replace the lender data in the database with a catalog snapshot.
+        
+        Lender and category IDs are kept, so saved matches stay valid. Lenders
+        that are not in the snapshot are deleted. Everything is written in a
+        single transaction, and nothing is written if the snapshot is corrupt.
+        
+        Args:
+            snapshot_path (str): Path of the snapshot file to load
+        
+        Returns:
+            dict: Import-style status with the number of lenders and criteria loaded
+        """
+        start = time.perf_counter()
         try:
-            # Read the Full Financials sheet
-            full_financials_df = pd.read_excel(self.excel_file, sheet_name='Full Financials')
-            
-            # Connect to the database
-            self.db.connect()
+            catalog_version, tables = read_snapshot(snapshot_path)
+        except (OSError, ValueError) as e:
+            print(f"Error reading {snapshot_path}: {e}")
+            return {"status": "error", "message": f"Could not read snapshot: {e}"}
+        
+        self.db.create_tables()
+        self.db.connect()
+        try:
+            self.db.conn.execute("BEGIN IMMEDIATE")
+            cursor = self.db.cursor
             
-            # Get criteria categories from database
-            self.db.cursor.execute("SELECT id, name FROM criteria_categories")
-            categories = {row['name']: row['id'] for row in self.db.cursor.fetchall()}
+            cursor.execute("DELETE FROM lender_criteria")
+            cursor.execute("""
+                DELETE FROM lenders
+                WHERE id NOT IN (SELECT value FROM json_each(?))
+            """, (json.dumps([row[0] for row in tables['lenders']]),))
             
-            # Map spreadsheet rows to criteria categories
-            criteria_mapping = self._get_full_financials_criteria_mapping(full_financials_df)
+            cursor.executemany("""
+                INSERT INTO criteria_categories (id, name, description) VALUES (?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET name = excluded.name, description = excluded.description
+            """, tables['criteria_categories'])
+            cursor.executemany("""
+                INSERT INTO lenders (id, name, program_type) VALUES (?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET name = excluded.name, program_type = excluded.program_type
+            """, tables['lenders'])
+            cursor.executemany("""
+                INSERT INTO lender_criteria (lender_id, category_id, value) VALUES (?, ?, ?)
+            """, tables['lender_criteria'])
             
-            # Get lender columns (skip the first two columns)
-            lender_columns = [col for col in full_financials_df.columns 
-                             if col != 'APP-ONLY Programs' and col != 'Unnamed: 1' and pd.notna(col)]
-            
-            # Process each lender
-            for lender_name in lender_columns:
-                # Insert lender
-                self.db.cursor.execute(
-                    "INSERT OR IGNORE INTO lenders (name, program_type) VALUES (?, ?)",
-                    (lender_name, 'Full Financials')
-                )
-                self.db.conn.commit()
-                
-                # Get lender ID
-                self.db.cursor.execute("SELECT id FROM lenders WHERE name = ?", (lender_name,))
-                lender_id = self.db.cursor.fetchone()['id']
-                
-                # Process each criterion for this lender
-                for criterion_name, row_index in criteria_mapping.items():
-                    if criterion_name in categories:
-                        category_id = categories[criterion_name]
-                        
-                        # Get the value for this lender and criterion
-                        value = full_financials_df.iloc[row_index, full_financials_df.columns.get_loc(lender_name)]
-                        
-                        # Skip if value is NaN
-                        if pd.isna(value):
-                            continue
-                            
-                        # Convert value to string
-                        value_str = str(value)
-                        
-                        # Insert or update lender criterion
-                        self.db.cursor.execute("""
-                            INSERT OR REPLACE INTO lender_criteria 
-                            (lender_id, category_id, value, updated_at) 
-                            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-                        """, (lender_id, category_id, value_str))
+            # Spreadsheet fingerprints no longer describe what is in the database
+            cursor.execute("DELETE FROM lender_fingerprints")
             
+            self.db.refresh_lender_profiles()
+            self.db.bump_catalog_version()
             self.db.conn.commit()
-            
         except Exception as e:
-            print(f"Error importing Full Financials data: {e}")
-            if self.db.conn:
-                self.db.conn.rollback()
+            self.db.conn.rollback()
+            print(f"Error loading lender data, no changes were made: {e}")
+            return {"status": "error", "message": f"Snapshot load failed and was rolled back: {e}"}
         finally:
             self.db.close()
+        
+        seconds = time.perf_counter() - start
+        print(f"Loaded {len(tables['lenders'])} lenders and {len(tables['lender_criteria'])} criteria "
+              f"from snapshot version {catalog_version} in {seconds * 1000:.1f} ms")
+        
+        return {
+            "status": "success",
+            "message": f"Lender data loaded from {snapshot_path}",
+            "lenders": len(tables['lenders']),
+            "criteria": len(tables['lender_criteria']),
+            "seconds": round(seconds, 3)
+        }
     
-    def _get_app_only_criteria_mapping(self, df):
-        """Map criteria names from App Only sheet to database categories."""
-        # Get the first column which contains criteria names
-        criteria_column = df.iloc[:, 0]
-        
-        # Create mapping from spreadsheet criteria to database categories
-        mapping = {}
-        
-        # Find all non-NaN values in the first column
-        for i, value in enumerate(criteria_column):
-            if pd.notna(value) and value != '':
-                # Map spreadsheet criteria names to database category names
-                if value == 'Amount considered':
-                    mapping['amount_considered'] = i
-                elif value == 'Time in Business':
-                    mapping['time_in_business'] = i
-                elif value == 'Start-ups ':
-                    mapping['startups'] = i
-                elif value == 'Personal Credit':
-                    mapping['personal_credit'] = i
-                elif value == 'Paynet':
-                    mapping['paynet'] = i
-                elif value == 'Bank Statements':
-                    mapping['bank_statements'] = i
-                elif value == 'Collateral Age':
-                    mapping['collateral_age'] = i
-                elif value == 'Specialialty Products':
-                    mapping['special_products'] = i
-                elif value == 'Titled Vehicles':
-                    mapping['titled_vehicles'] = i
-                elif value == 'Restricted Industries':
-                    mapping['restricted_industries'] = i
-                elif value == 'Restricted Equipment':
-                    mapping['restricted_equipment'] = i
-                elif value == 'State Restrictions':
-                    mapping['state_restrictions'] = i
-                elif value == 'Cost of Funds Ranges':
-                    mapping['cost_of_funds'] = i
-                elif value == 'Max Commision':
-                    mapping['max_commission'] = i
-                elif value == 'Syndicator\'s Notes':
-                    mapping['syndicator_notes'] = i
-                elif value == 'Disclosure Requirements':
-                    mapping['disclosure_requirements'] = i
-        
-        return mapping
-    
-    def _get_full_financials_criteria_mapping(self, df):
-        """Map criteria names from Full Financials sheet to database categories."""
-        # Get the first column which contains criteria names
-        criteria_column = df.iloc[:, 0]
-        
-        # Create mapping from spreadsheet criteria to database categories
-        mapping = {}
-        
-        # Find all non-NaN values in the first column
-        for i, value in enumerate(criteria_column):
-            if pd.notna(value) and value != '':
-                # Map spreadsheet criteria names to database category names
-                if value == 'Amount considered':
-                    mapping['amount_considered'] = i
-                elif value == 'Personal Credit':
-                    mapping['personal_credit'] = i
-                elif value == 'Business Credit':
-                    mapping['business_credit'] = i
-                elif value == 'Bank Statements':
-                    mapping['bank_statements'] = i
-                elif value == 'Collateral Age':
-                    mapping['collateral_age'] = i
-                elif value == 'Special deals':
-                    mapping['special_deals'] = i
-                elif value == 'Titled Vehicles':
-                    mapping['titled_vehicles'] = i
-                elif value == 'Time in Business':
-                    mapping['time_in_business'] = i
-                elif value == 'Start-ups ':
-                    mapping['startups'] = i
-                elif value == 'Special Industries':
-                    mapping['special_products'] = i
-                elif value == 'Restricted Industries':
-                    mapping['restricted_industries'] = i
-                elif value == 'Restricted Equipment':
-                    mapping['restricted_equipment'] = i
-                elif value == 'State Restrictions':
-                    mapping['state_restrictions'] = i
-                elif value == 'Cost of Fund':
-                    mapping['cost_of_funds'] = i
-                elif value == 'Max Commision':
-                    mapping['max_commission'] = i
-                elif value == 'Syndicator\'s Notes':
-                    mapping['syndicator_notes'] = i
-                elif value == 'Disclosure Requirements':
-                    mapping['disclosure_requirements'] = i
-        
-        return mapping
+    def _find_unparsed_state_restrictions(self):
+        """Report state restriction entries that do not name a state, which matching ignores."""
+        self.db.cursor.execute("""
+            SELECT l.name, lc.value
+            FROM lender_criteria lc
+            JOIN lenders l ON lc.lender_id = l.id
+            JOIN criteria_categories c ON lc.category_id = c.id
+            WHERE c.name = 'state_restrictions'
+            ORDER BY l.name
+        """)
+        
+        unparsed = {}
+        for row in self.db.cursor.fetchall():
+            if not row['value']:
+                continue
+            criterion = CompiledCriterion('state_restrictions', row['value'])
+            if criterion.unparsed:
+                unparsed[row['name']] = list(criterion.unparsed)
+                print(f"Warning: could not parse state restrictions for {row['name']}: "
+                      f"{', '.join(criterion.unparsed)}")
+        
+        return unparsed
 
-# If run directly, import data from the specified Excel file
+# If run directly, import data from the specified Excel file, or export or
+# load a catalog snapshot with --export-snapshot PATH / --load-snapshot PATH
 if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] in ('--export-snapshot', '--load-snapshot'):
+        importer = LenderDataImporter(None)
+        if sys.argv[1] == '--export-snapshot':
+            result = importer.export_snapshot(sys.argv[2])
+        else:
+            result = importer.load_snapshot(sys.argv[2])
+        print(result)
+        sys.exit(0 if result['status'] == 'success' else 1)
+    
     if len(sys.argv) > 1:
         excel_file = sys.argv[1]
     else:
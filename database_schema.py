@@ -8,27 +8,235 @@ It includes models for lenders, their criteria, and the relationships between th
 import sqlite3
 import os
 import json
+import threading
+import time
 from datetime import datetime
+from urllib.request import pathname2url
+from lender_catalog import (CompiledCriterion, PROFILE_COLUMNS, CLIENT_PROFILE_COLUMNS,
+                            build_lender_profile, build_client_profile)
+
+# Seconds a connection waits for a lock held by another worker before failing
+BUSY_TIMEOUT = 5.0
+
+# Applied to every new connection
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",     # Safe with WAL, far fewer fsyncs
+    "PRAGMA cache_size = -16000",      # 16 MB page cache per connection
+    "PRAGMA mmap_size = 268435456",    # Read pages through a 256 MB memory map
+    "PRAGMA temp_store = MEMORY"
+)
+
+# Connections are reused per thread, and per process so forked workers never share one
+_pool = threading.local()
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that adds the time spent executing and fetching to its connection's query_seconds."""
+    
+    def execute(self, *args):
+        start = time.perf_counter()
+        try:
+            return super().execute(*args)
+        finally:
+            self.connection.add_query_time(time.perf_counter() - start)
+    
+    def executemany(self, *args):
+        tracer = self.connection.tracer
+        if tracer is not None:
+            tracer.set_bulk(True)
+        start = time.perf_counter()
+        try:
+            return super().executemany(*args)
+        finally:
+            self.connection.add_query_time(time.perf_counter() - start)
+            if tracer is not None:
+                tracer.set_bulk(False)
+    
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            self.connection.add_query_time(time.perf_counter() - start)
+    
+    def fetchmany(self, *args):
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(*args)
+        finally:
+            self.connection.add_query_time(time.perf_counter() - start)
+    
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self.connection.add_query_time(time.perf_counter() - start)
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection that counts the statements executed on it and the time they take."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statement_count = 0
+        self.query_seconds = 0.0
+        self.tracer = None
+        self.set_trace_callback(self._count_statement)
+    
+    def _count_statement(self, statement):
+        self.statement_count += 1
+        if self.tracer is not None:
+            self.tracer.statement(statement)
+    
+    def add_query_time(self, seconds):
+        self.query_seconds += seconds
+        if self.tracer is not None:
+            self.tracer.add_time(seconds)
+    
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+    
+    # The connection shortcuts do not go through cursor(), so route them there
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+    
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+def open_connection(db_path, readonly=False):
+    """
+    Open a tuned SQLite connection.
+    
+    Read-write connections switch the database to WAL journal mode so readers
+    are never blocked by a writer. Read-only connections cannot write at all.
+    
+    Args:
+        db_path (str): Path to the SQLite database
+        readonly (bool): Open the database in read-only mode
+        
+    Returns:
+        PooledConnection: The new connection
+    """
+    if readonly:
+        uri = f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT, factory=PooledConnection)
+        conn.execute("PRAGMA query_only = ON")
+    else:
+        conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, factory=PooledConnection)
+        conn.execute("PRAGMA journal_mode = WAL")
+    
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    conn.statement_count = 0
+    return conn
 
 class BrokerBuddyDB:
-    def __init__(self, db_path='/home/ubuntu/brokerbuddy/brokerbuddy.db'):
-        """Initialize the database connection."""
+    # Optional SQLTracer installed on connections by connect(); see sql_trace.py
+    tracer = None
+    
+    def __init__(self, db_path='/home/ubuntu/brokerbuddy/brokerbuddy.db', readonly=False):
+        """
+        Initialize the database connection.
+        
+        Args:
+            db_path (str): Path to the SQLite database
+            readonly (bool): Use a read-only connection, for matching and other read paths
+        """
         self.db_path = db_path
+        self.readonly = readonly
         self.conn = None
         self.cursor = None
+        self._query_count = 0
+        self._count_start = 0
+        self._query_seconds = 0.0
+        self._seconds_start = 0.0
         
     def connect(self):
-        """Connect to the SQLite database."""
-        self.conn = sqlite3.connect(self.db_path)
+        """Connect to the SQLite database, reusing this thread's pooled connection."""
+        self.conn = self._pooled_connection()
         self.conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+        tracer = BrokerBuddyDB.tracer
+        self.conn.tracer = tracer if tracer is not None and tracer.enabled else None
         self.cursor = self.conn.cursor()
+        self._count_start = self.conn.statement_count
+        self._seconds_start = self.conn.query_seconds
         return self.conn
     
+    def _pooled_connection(self):
+        if getattr(_pool, 'pid', None) != os.getpid():
+            _pool.pid = os.getpid()
+            _pool.connections = {}
+        
+        key = (os.path.abspath(self.db_path), self.readonly)
+        conn = _pool.connections.get(key)
+        if conn is None:
+            conn = _pool.connections[key] = open_connection(self.db_path, self.readonly)
+        return conn
+    
+    @property
+    def query_count(self):
+        """Number of SQL statements executed through this object."""
+        if self.conn is None:
+            return self._query_count
+        return self._query_count + self.conn.statement_count - self._count_start
+    
+    @property
+    def query_seconds(self):
+        """Seconds spent executing statements and fetching rows through this object."""
+        if self.conn is None:
+            return self._query_seconds
+        return self._query_seconds + self.conn.query_seconds - self._seconds_start
+    
     def close(self):
-        """Close the database connection."""
+        """Release the connection back to the pool, discarding any uncommitted changes."""
         if self.conn:
-            self.conn.close()
+            self._query_count = self.query_count
+            self._query_seconds = self.query_seconds
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            self.conn = None
+            self.cursor = None
+    
+    @staticmethod
+    def close_pool():
+        """Close every pooled connection owned by the current thread."""
+        if getattr(_pool, 'pid', None) == os.getpid():
+            for conn in _pool.connections.values():
+                conn.close()
+        _pool.connections = {}
+        _pool.pid = os.getpid()
+            
+    def get_catalog_version(self):
+        """Return the lender catalog version, which changes whenever lender data changes."""
+        self.cursor.execute("SELECT value FROM settings WHERE key = 'lender_catalog_version'")
+        row = self.cursor.fetchone()
+        return int(row['value']) if row else 0
+    
+    def bump_catalog_version(self):
+        """Increment the lender catalog version. The caller is responsible for committing."""
+        self.cursor.execute("""
+            INSERT INTO settings (key, value) VALUES ('lender_catalog_version', '1')
+            ON CONFLICT (key) DO UPDATE
+            SET value = CAST(value AS INTEGER) + 1, updated_at = CURRENT_TIMESTAMP
+        """)
             
+    def get_lender_criteria(self, lender_id):
+        """
+        Return a lender's non-empty criteria values.
+        
+        Args:
+            lender_id (int): ID of the lender
+            
+        Returns:
+            dict: Criteria category name -> value
+        """
+        self.cursor.execute("""
+            SELECT c.name, lc.value
+            FROM lender_criteria lc
+            JOIN criteria_categories c ON lc.category_id = c.id
+            WHERE lc.lender_id = ?
+        """, (lender_id,))
+        return {row['name']: row['value'] for row in self.cursor.fetchall() if row['value']}
+    
     def create_tables(self):
         """Create all necessary tables for the BrokerBuddy application."""
         self.connect()
@@ -70,6 +278,40 @@ class BrokerBuddyDB:
         )
         ''')
         
+        # Create Lender Profiles table with typed thresholds derived from lender_criteria,
+        # so hard requirements can be checked with an indexed query
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS lender_profiles (
+            lender_id INTEGER PRIMARY KEY,
+            min_amount REAL,
+            max_amount REAL,
+            min_personal_credit INTEGER,
+            max_personal_credit INTEGER,
+            min_business_credit INTEGER,
+            max_business_credit INTEGER,
+            min_tib_months REAL,
+            max_collateral_years REAL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (lender_id) REFERENCES lenders (id) ON DELETE CASCADE
+        )
+        ''')
+        for column in ('min_amount', 'max_amount', 'min_personal_credit',
+                       'min_business_credit', 'min_tib_months', 'max_collateral_years'):
+            self.cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_lender_profiles_{column} ON lender_profiles ({column})"
+            )
+        
+        # Create Lender Fingerprints table with a hash of each lender's spreadsheet
+        # column as of the last import, so unchanged lenders can be skipped
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS lender_fingerprints (
+            lender_id INTEGER PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (lender_id) REFERENCES lenders (id) ON DELETE CASCADE
+        )
+        ''')
+        
         # Create Client table for saving client profiles
         self.cursor.execute('''
         CREATE TABLE IF NOT EXISTS clients (
@@ -97,6 +339,27 @@ class BrokerBuddyDB:
         )
         ''')
         
+        # Create Client Profiles table with typed copies of the values lender
+        # requirements compare, so the clients a lender accepts can be found with
+        # an indexed query (see client_criteria for the raw values)
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS client_profiles (
+            client_id INTEGER PRIMARY KEY,
+            amount REAL,
+            personal_credit INTEGER,
+            business_credit INTEGER,
+            tib_months REAL,
+            collateral_years REAL,
+            state_mask INTEGER,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (client_id) REFERENCES clients (id) ON DELETE CASCADE
+        )
+        ''')
+        for column in ('amount', 'personal_credit', 'business_credit', 'tib_months', 'collateral_years'):
+            self.cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_client_profiles_{column} ON client_profiles ({column})"
+            )
+        
         # Create Matches table for storing match results
         self.cursor.execute('''
         CREATE TABLE IF NOT EXISTS matches (
@@ -110,6 +373,10 @@ class BrokerBuddyDB:
             FOREIGN KEY (lender_id) REFERENCES lenders (id) ON DELETE CASCADE
         )
         ''')
+        # Saving a client's matches replaces all of its rows
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_matches_client ON matches (client_id)")
+        # Re-matching a changed lender reads and rewrites all of its rows
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_matches_lender ON matches (lender_id, client_id)")
         
         # Create Settings table for application settings
         self.cursor.execute('''
@@ -147,9 +414,163 @@ class BrokerBuddyDB:
         )
         ''')
         
+        # Backfill profiles for lenders created before the table existed
+        self.cursor.execute("""
+            SELECT id FROM lenders
+            WHERE id NOT IN (SELECT lender_id FROM lender_profiles)
+        """)
+        missing = [row['id'] for row in self.cursor.fetchall()]
+        if missing:
+            self.refresh_lender_profiles(missing)
+        
+        self.cursor.execute("""
+            SELECT id FROM clients
+            WHERE id NOT IN (SELECT client_id FROM client_profiles)
+        """)
+        missing = [row['id'] for row in self.cursor.fetchall()]
+        if missing:
+            self.refresh_client_profiles(missing)
+        
         self.conn.commit()
         self.close()
         
+    def refresh_lender_profiles(self, lender_ids=None):
+        """
+        Recompute the typed lender_profiles rows from lender_criteria.
+        
+        The caller is responsible for committing.
+        
+        Args:
+            lender_ids (list): IDs of the lenders to refresh, or None for all lenders
+        """
+        lenders_clause = ''
+        params = []
+        if lender_ids is not None:
+            lender_ids = list(lender_ids)
+            if not lender_ids:
+                return
+            lenders_clause = f"IN ({', '.join('?' * len(lender_ids))})"
+            params = lender_ids
+        
+        self.cursor.execute(f"SELECT id FROM lenders {'WHERE id ' + lenders_clause if params else ''}",
+                            params)
+        criteria = {row['id']: [] for row in self.cursor.fetchall()}
+        
+        self.cursor.execute(f"""
+            SELECT lc.lender_id, c.name, lc.value
+            FROM lender_criteria lc
+            JOIN criteria_categories c ON lc.category_id = c.id
+            WHERE c.name IN ({', '.join('?' * len(PROFILE_COLUMNS))})
+            {'AND lc.lender_id ' + lenders_clause if params else ''}
+        """, list(PROFILE_COLUMNS) + params)
+        for row in self.cursor.fetchall():
+            if row['value']:
+                criteria[row['lender_id']].append(CompiledCriterion(row['name'], row['value']))
+        
+        self.cursor.execute(f"DELETE FROM lender_profiles {'WHERE lender_id ' + lenders_clause if params else ''}",
+                            params)
+        
+        columns = list(build_lender_profile([]))
+        self.cursor.executemany(f"""
+            INSERT INTO lender_profiles (lender_id, {', '.join(columns)})
+            VALUES ({', '.join('?' * (len(columns) + 1))})
+        """, [
+            (lender_id,) + tuple(build_lender_profile(lender_criteria).values())
+            for lender_id, lender_criteria in criteria.items()
+        ])
+        
+    def refresh_client_profiles(self, client_ids=None):
+        """
+        Recompute the typed client_profiles rows from client_criteria.
+        
+        Call after saving a client's criteria. The caller is responsible for committing.
+        
+        Args:
+            client_ids (list): IDs of the clients to refresh, or None for all clients
+        """
+        clients_clause = ''
+        params = []
+        if client_ids is not None:
+            client_ids = list(client_ids)
+            if not client_ids:
+                return
+            clients_clause = f"IN ({', '.join('?' * len(client_ids))})"
+            params = client_ids
+        
+        self.cursor.execute(f"SELECT id FROM clients {'WHERE id ' + clients_clause if params else ''}",
+                            params)
+        client_data = {row['id']: {} for row in self.cursor.fetchall()}
+        
+        self.cursor.execute(f"""
+            SELECT cc.client_id, c.name, cc.value
+            FROM client_criteria cc
+            JOIN criteria_categories c ON cc.category_id = c.id
+            WHERE c.name IN ({', '.join('?' * len(CLIENT_PROFILE_COLUMNS))})
+            {'AND cc.client_id ' + clients_clause if params else ''}
+        """, list(CLIENT_PROFILE_COLUMNS) + params)
+        for row in self.cursor.fetchall():
+            if row['value'] and row['client_id'] in client_data:
+                client_data[row['client_id']][row['name']] = row['value']
+        
+        self.cursor.execute(f"DELETE FROM client_profiles {'WHERE client_id ' + clients_clause if params else ''}",
+                            params)
+        
+        columns = list(CLIENT_PROFILE_COLUMNS.values())
+        self.cursor.executemany(f"""
+            INSERT INTO client_profiles (client_id, {', '.join(columns)})
+            VALUES ({', '.join('?' * (len(columns) + 1))})
+        """, [
+            (client_id,) + tuple(build_client_profile(data).values())
+            for client_id, data in client_data.items()
+        ])
+        
+    def save_client(self, client_data, client_id=None):
+        """
+        Save a client and its criteria values in a single transaction.
+        
+        The client's client_profiles row is refreshed in the same transaction,
+        so the prospects search always sees the criteria as saved.
+        
+        Args:
+            client_data (dict): Client information; client_name, client_email and
+                client_phone fill the clients row, and values keyed by a criteria
+                category name are stored in client_criteria
+            client_id (int): ID of the client to update, or None to add a new client
+            
+        Returns:
+            int: ID of the saved client
+        """
+        client = (client_data.get('client_name') or 'Unnamed client',
+                  client_data.get('client_email'), client_data.get('client_phone'))
+        
+        try:
+            if not self.conn.in_transaction:
+                self.conn.execute("BEGIN IMMEDIATE")
+            
+            if client_id is not None:
+                self.cursor.execute("""
+                    UPDATE clients
+                    SET name = ?, email = ?, phone = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, client + (client_id,))
+            if client_id is None or self.cursor.rowcount == 0:
+                self.cursor.execute("INSERT INTO clients (name, email, phone) VALUES (?, ?, ?)", client)
+                client_id = self.cursor.lastrowid
+            
+            # Replace the client's values; keys that are not criteria categories are skipped
+            self.cursor.execute("DELETE FROM client_criteria WHERE client_id = ?", (client_id,))
+            self.cursor.executemany("""
+                INSERT INTO client_criteria (client_id, category_id, value)
+                SELECT ?, id, ? FROM criteria_categories WHERE name = ?
+            """, [(client_id, value, name) for name, value in client_data.items() if value])
+            
+            self.refresh_client_profiles([client_id])
+            self.conn.commit()
+            return client_id
+        except Exception:
+            self.conn.rollback()
+            raise
+        
     def populate_criteria_categories(self):
         """Populate the criteria categories based on the spreadsheet analysis."""
         self.connect()
@@ -0,0 +1,759 @@
+"""
+BrokerBuddy Lender Catalog
+
+This module compiles the free-text lender criteria stored in the database into
+typed thresholds. The catalog is built once and reused across requests so the
+matching engine only has to compare numbers instead of re-parsing strings.
+"""
+
+import re
+import sys
+import time
+
+import numpy as np
+
+from restriction_index import RestrictionIndex
+from state_masks import parse_states, state_mask
+
+# Criteria weights (some criteria are more important than others)
+CRITERIA_WEIGHTS = {
+    'amount_considered': 2.0,
+    'time_in_business': 1.5,
+    'personal_credit': 1.5,
+    'business_credit': 1.0,
+    'bank_statements': 1.0,
+    'collateral_age': 1.0,
+    'titled_vehicles': 0.8,
+    'restricted_industries': 1.2,
+    'restricted_equipment': 1.2,
+    'state_restrictions': 1.5,
+    'startups': 0.8,
+    'special_products': 0.5,
+    'paynet': 0.8,
+    'special_deals': 0.5
+}
+
+# Weight for criteria not in the weights dictionary
+DEFAULT_WEIGHT = 1.0
+
+# Criteria that list values the lender does not accept
+RESTRICTION_CRITERIA = ('restricted_industries', 'restricted_equipment', 'state_restrictions')
+
+# Restriction values that mean nothing is restricted
+UNRESTRICTED_VALUES = ('none', 'no', 'n/a', '')
+
+# How each criterion is compared, anything else uses generic string matching
+CRITERION_KINDS = {
+    'amount_considered': 'amount',
+    'time_in_business': 'time_in_business',
+    'personal_credit': 'credit',
+    'business_credit': 'credit',
+    'collateral_age': 'collateral_age',
+    'restricted_industries': 'restriction',
+    'restricted_equipment': 'restriction',
+    'state_restrictions': 'state'
+}
+
+# Typed lender_profiles columns holding each numeric criterion's (low, high) threshold
+PROFILE_COLUMNS = {
+    'amount_considered': ('min_amount', 'max_amount'),
+    'personal_credit': ('min_personal_credit', 'max_personal_credit'),
+    'business_credit': ('min_business_credit', 'max_business_credit'),
+    'time_in_business': ('min_tib_months', None),
+    'collateral_age': (None, 'max_collateral_years')
+}
+
+# Typed client_profiles column holding each client value that hard requirements compare
+CLIENT_PROFILE_COLUMNS = {
+    'amount_considered': 'amount',
+    'personal_credit': 'personal_credit',
+    'business_credit': 'business_credit',
+    'time_in_business': 'tib_months',
+    'collateral_age': 'collateral_years',
+    'state_restrictions': 'state_mask'
+}
+
+NUMBER_RE = re.compile(r'(\d+\.?\d*)')
+INTEGER_RE = re.compile(r'(\d+)')
+NON_NUMERIC_RE = re.compile(r'[^\d.]')
+FULL_YEARS_RE = re.compile(r'(\d+)\+?\s+Full Years')
+CREDIT_PLUS_RE = re.compile(r'(\d+)\+')
+CREDIT_RANGE_RE = re.compile(r'(\d+)\s*-\s*(\d+)')
+
+
+def parse_amount(amount_str):
+    """
+    Parse amount string with k/m suffixes.
+
+    Args:
+        amount_str (str): Amount string with possible k/m suffix
+
+    Returns:
+        float: Parsed amount in dollars
+    """
+    amount_str = amount_str.strip().lower()
+
+    if 'k' in amount_str:
+        return float(amount_str.replace('k', '')) * 1000
+    elif 'm' in amount_str:
+        return float(amount_str.replace('m', '')) * 1000000
+    else:
+        return float(amount_str)
+
+
+def parse_time_in_business(time_str):
+    """
+    Parse time in business string to months.
+
+    Args:
+        time_str (str): Time string with possible year/month indicators
+
+    Returns:
+        float: Time in months
+    """
+    time_str = time_str.lower()
+
+    if 'year' in time_str or 'yr' in time_str:
+        # Extract number of years
+        return float(NUMBER_RE.search(time_str).group(1)) * 12
+    elif 'month' in time_str or 'mo' in time_str:
+        # Extract number of months
+        return float(NUMBER_RE.search(time_str).group(1))
+    else:
+        # Assume it's just a number representing years
+        return float(NUMBER_RE.search(time_str).group(1)) * 12
+
+
+def parse_client_amount(value):
+    """Parse a client's requested amount, ignoring currency formatting."""
+    return float(NON_NUMERIC_RE.sub('', value))
+
+
+def parse_client_credit(value):
+    """Parse the first number in a client's credit score."""
+    return int(INTEGER_RE.search(value).group(1))
+
+
+def parse_client_years(value):
+    """Parse a client's equipment age in years."""
+    return float(NUMBER_RE.search(value).group(1))
+
+
+# Parsers for client values that are compared numerically
+CLIENT_PARSERS = {
+    'amount': parse_client_amount,
+    'time_in_business': parse_time_in_business,
+    'credit': parse_client_credit,
+    'collateral_age': parse_client_years,
+    'state': state_mask
+}
+
+
+class ClientProfile:
+    """Client data with numeric values parsed once per request."""
+
+    def __init__(self, client_data, catalog=None):
+        """
+        Parse the numeric client values used by the compiled criteria.
+
+        Args:
+            client_data (dict): Dictionary containing client information
+            catalog (CompiledLenderCatalog): Catalog whose restriction indexes
+                are used to look up restricted values; restriction lists are
+                scanned directly if omitted
+        """
+        self.data = client_data
+        self.catalog = catalog
+        self.numbers = {}
+        self.restricted = {}
+
+        for name, kind in CRITERION_KINDS.items():
+            parser = CLIENT_PARSERS.get(kind)
+            value = client_data.get(name, '')
+            if parser is None or not value:
+                continue
+            try:
+                self.numbers[name] = (parser(value), None)
+            except Exception as e:
+                self.numbers[name] = (None, str(e))
+
+    def get(self, name):
+        """Return the raw client value for a criterion."""
+        return self.data.get(name, '')
+
+    def number(self, name):
+        """Return a (value, error) tuple for a numeric criterion."""
+        return self.numbers.get(name, (None, 'No client value'))
+
+    def restricting_lenders(self, name):
+        """
+        Return the IDs of lenders whose restriction list excludes the client's value.
+
+        Args:
+            name (str): Restriction criterion name
+
+        Returns:
+            set: Lender IDs, or None if there is no catalog to look them up in
+        """
+        if self.catalog is None:
+            return None
+        lenders = self.restricted.get(name)
+        if lenders is None:
+            lenders = self.catalog.restriction_index(name).restricting_lenders(self.get(name))
+            self.restricted[name] = lenders
+        return lenders
+
+
+class CompiledCriterion:
+    """A single lender criterion with its thresholds parsed ahead of time."""
+
+    __slots__ = ('name', 'value', 'category_id', 'lender_id', 'weight', 'kind', 'text', 'low',
+                 'high', 'label', 'items', 'mask', 'unparsed', 'unrestricted', 'error')
+
+    def __init__(self, name, value, category_id=None, lender_id=None):
+        """
+        Compile a lender criterion value.
+
+        Args:
+            name (str): Criteria category name
+            value (str): Lender's free-text value for the criterion
+            category_id (int): ID of the criteria category
+            lender_id (int): ID of the lender the criterion belongs to
+        """
+        self.name = name
+        self.category_id = category_id
+        self.lender_id = lender_id
+        self.value = value
+        self.weight = CRITERIA_WEIGHTS.get(name, DEFAULT_WEIGHT)
+        self.kind = CRITERION_KINDS.get(name, 'generic')
+        self.text = value
+        self.low = None
+        self.high = None
+        self.label = None
+        self.items = ()
+        self.mask = 0
+        self.unparsed = ()
+        self.unrestricted = False
+        self.error = None
+
+        try:
+            getattr(self, '_compile_' + self.kind)()
+        except Exception as e:
+            self.error = str(e)
+
+    def _compile_amount(self):
+        # Extract min and max from lender range (e.g., "$10k-$150k")
+        self.text = self.value.replace('$', '').replace(',', '')
+        parts = self.text.split('-')
+        self.low = parse_amount(parts[0])
+        self.high = parse_amount(parts[1]) if len(parts) > 1 else float('inf')
+
+    def _compile_time_in_business(self):
+        if "Full Years" in self.value:
+            # Extract the number before "Full Years"
+            self.low = float(FULL_YEARS_RE.search(self.value).group(1)) * 12
+        else:
+            self.low = parse_time_in_business(self.value)
+
+    def _compile_credit(self):
+        requirement = self.value
+        if '+' in requirement:
+            # Format like "650+"
+            self.low = int(CREDIT_PLUS_RE.search(requirement).group(1))
+            self.label = f"{self.low}+"
+        elif '-' in requirement and not requirement.startswith('No'):
+            # Format like "650-700"
+            match = CREDIT_RANGE_RE.search(requirement)
+            if match:
+                self.low = int(match.group(1))
+                self.high = int(match.group(2))
+                self.label = f"{self.low}-{self.high}"
+            else:
+                # If we can't parse the range, just extract the first number
+                self.low = int(INTEGER_RE.search(requirement).group(1))
+                self.label = f"{self.low}+"
+        else:
+            # Just a number or other format
+            self.low = int(INTEGER_RE.search(requirement).group(1))
+            self.label = f"{self.low}"
+
+    def _compile_collateral_age(self):
+        # Extract maximum age from lender requirement
+        self.high = float(INTEGER_RE.search(self.value).group(1))
+
+    def _compile_restriction(self):
+        if self.value.lower() in UNRESTRICTED_VALUES:
+            self.unrestricted = True
+        else:
+            self.items = tuple(item.strip().lower() for item in self.value.split(','))
+
+    def _compile_state(self):
+        if self.value.lower() in UNRESTRICTED_VALUES:
+            self.unrestricted = True
+        else:
+            # Entries that name no state are kept for reporting and never restrict anyone
+            self.mask, unparsed = parse_states(self.value)
+            self.unparsed = tuple(unparsed)
+
+    def _compile_generic(self):
+        self.text = self.value.lower()
+
+    def evaluate(self, client):
+        """
+        Compare the client against this criterion.
+
+        Args:
+            client (ClientProfile): Parsed client information
+
+        Returns:
+            tuple: (match_result, reason)
+        """
+        client_value = client.get(self.name)
+
+        if self.kind == 'amount':
+            amount, error = client.number(self.name)
+            if error is not None:
+                return False, f"Could not parse amount: Client: {client_value}, Lender: {self.value}. Error: {error}"
+            if self.error is not None:
+                return False, f"Could not parse amount: Client: {amount}, Lender: {self.text}. Error: {self.error}"
+            return self.low <= amount <= self.high, f"Client: ${amount:,.2f}, Lender: {self.text}"
+
+        if self.kind == 'time_in_business':
+            months, error = client.number(self.name)
+            error = error if error is not None else self.error
+            if error is not None:
+                return False, f"Could not parse time: Client: {client_value}, Lender: {self.value}. Error: {error}"
+            reason = f"Client: {client_value} ({months} months), Lender requires: {self.value} ({self.low} months)"
+            return months >= self.low, reason
+
+        if self.kind == 'credit':
+            score, error = client.number(self.name)
+            if error is not None:
+                return False, f"Could not parse credit score: Client: {client_value}, Lender: {self.value}. Error: {error}"
+            if self.error is not None:
+                return False, f"Could not parse credit score: Client: {score}, Lender: {self.value}. Error: {self.error}"
+            if self.high is not None:
+                match_result = self.low <= score <= self.high
+            else:
+                match_result = score >= self.low
+            return match_result, f"Client: {score}, Lender requires: {self.label}"
+
+        if self.kind == 'collateral_age':
+            years, error = client.number(self.name)
+            error = error if error is not None else self.error
+            if error is not None:
+                return False, f"Could not parse collateral age: Client: {client_value}, Lender: {self.value}. Error: {error}"
+            return years <= self.high, f"Client: {client_value}, Lender requires: {self.value}"
+
+        if self.kind == 'restriction':
+            if self.unrestricted:
+                return True, "No restrictions"
+            restricting = client.restricting_lenders(self.name)
+            if restricting is not None and self.lender_id is not None:
+                # Match when the client's value is NOT restricted
+                match_result = self.lender_id not in restricting
+            else:
+                match_result = self.matches_text(client_value)
+            return match_result, f"Client: {client_value}, Restricted: {self.value}"
+
+        if self.kind == 'state':
+            if self.unrestricted:
+                return True, "No restrictions"
+            # Match when none of the client's states are excluded by the lender
+            client_mask, error = client.number(self.name)
+            return not ((client_mask or 0) & self.mask), f"Client: {client_value}, Restricted: {self.value}"
+
+        # Generic string matching for other criteria
+        return self.matches_text(client_value), f"Client: {client_value}, Lender: {self.value}"
+
+    def test(self, client):
+        """
+        Check whether the client meets this criterion without building a reason.
+
+        Args:
+            client (ClientProfile): Parsed client information
+
+        Returns:
+            bool: The same match result evaluate would return
+        """
+        kind = self.kind
+
+        if kind == 'restriction' or kind == 'state':
+            if self.unrestricted:
+                return True
+            if kind == 'state':
+                client_mask = client.number(self.name)[0]
+                return not ((client_mask or 0) & self.mask)
+            restricting = client.restricting_lenders(self.name)
+            if restricting is not None and self.lender_id is not None:
+                return self.lender_id not in restricting
+            return self.matches_text(client.get(self.name))
+
+        if kind == 'generic':
+            return self.matches_text(client.get(self.name))
+
+        value, error = client.number(self.name)
+        if error is not None or self.error is not None:
+            return False
+        if kind == 'time_in_business':
+            return value >= self.low
+        if kind == 'collateral_age':
+            return value <= self.high
+        if self.high is None:
+            # Credit requirement with no upper bound
+            return value >= self.low
+        return self.low <= value <= self.high
+
+    def matches_text(self, client_value):
+        """
+        Compare a client value against a restriction or generic criterion.
+
+        Args:
+            client_value (str): Client's value for the criterion
+
+        Returns:
+            bool: True if the criterion is satisfied
+        """
+        client_value_lower = client_value.lower()
+
+        if self.kind == 'restriction':
+            # Match when the client's value is NOT restricted
+            if self.unrestricted:
+                return True
+            return not any(item in client_value_lower or client_value_lower in item
+                           for item in self.items)
+
+        return client_value_lower in self.text or self.text in client_value_lower
+
+
+def build_lender_profile(criteria):
+    """
+    Derive the typed lender_profiles columns from a lender's criteria.
+
+    Missing, unparseable and unbounded thresholds are None (NULL), meaning the
+    lender places no hard limit on that value.
+
+    Args:
+        criteria (iterable): CompiledCriterion objects for one lender
+
+    Returns:
+        dict: Column name to numeric threshold
+    """
+    profile = {column: None for columns in PROFILE_COLUMNS.values()
+               for column in columns if column}
+
+    for criterion in criteria:
+        columns = PROFILE_COLUMNS.get(criterion.name)
+        if columns is None or criterion.error is not None:
+            continue
+        for column, threshold in zip(columns, (criterion.low, criterion.high)):
+            if column and threshold is not None and threshold != float('inf'):
+                profile[column] = threshold
+
+    return profile
+
+
+def build_client_profile(client_data):
+    """
+    Derive the typed client_profiles columns from a client's data.
+
+    Missing and unparseable values are None (NULL), meaning no lender
+    requirement excludes the client on that value.
+
+    Args:
+        client_data (dict): Dictionary containing client information
+
+    Returns:
+        dict: Column name to parsed value
+    """
+    client = ClientProfile(client_data)
+    return {column: client.number(name)[0] for name, column in CLIENT_PROFILE_COLUMNS.items()}
+
+
+class CompiledLender:
+    """A lender with all of its criteria compiled."""
+
+    __slots__ = ('id', 'name', 'program_type', 'criteria', 'criteria_by_weight')
+
+    def __init__(self, lender_id, name, program_type, criteria):
+        self.id = lender_id
+        self.name = name
+        self.program_type = program_type
+        self.criteria = tuple(criteria)
+        # Heaviest first, so a failing lender loses most of its achievable score early
+        self.criteria_by_weight = tuple(sorted(self.criteria, key=lambda c: -c.weight))
+
+
+class CompiledLenderCatalog:
+    """
+    All lenders and their criteria, parsed once into typed thresholds.
+
+    The catalog is immutable once built. Callers rebuild it when the
+    lender catalog version stored in the database changes.
+    """
+
+    def __init__(self, lenders, version=0, build_seconds=0.0):
+        """
+        Initialize the catalog.
+
+        Args:
+            lenders (list): CompiledLender objects ordered by name
+            version (int): Lender catalog version the data was read at
+            build_seconds (float): Time spent loading and compiling
+        """
+        self.lenders = tuple(lenders)
+        self.by_id = {lender.id: lender for lender in self.lenders}
+        self.criterion_names = frozenset(criterion.name for lender in self.lenders
+                                         for criterion in lender.criteria)
+        self.by_program_type = {}
+        self.lender_arrays = {}
+        self.restriction_indexes = {}
+        self.version = version
+        self.build_seconds = build_seconds
+        self.memory_bytes = deep_sizeof(self.lenders)
+
+    @classmethod
+    def build(cls, conn, version=0, program_type=None):
+        """
+        Load every lender and its criteria in a single query and compile them.
+
+        Args:
+            conn (sqlite3.Connection): Database connection
+            version (int): Lender catalog version the data was read at
+            program_type (str): Only load lenders of this program type
+
+        Returns:
+            CompiledLenderCatalog: The compiled catalog
+        """
+        start = time.perf_counter()
+
+        # One pass over a cursor ordered by lender keeps the cost at a single
+        # round trip no matter how many lenders there are
+        query = """
+            SELECT l.id, l.name, l.program_type, lc.category_id, c.name, lc.value
+            FROM lenders l
+            LEFT JOIN lender_criteria lc ON lc.lender_id = l.id
+            LEFT JOIN criteria_categories c ON lc.category_id = c.id
+        """
+        params = ()
+        if program_type is not None:
+            query += " WHERE l.program_type = ?"
+            params = (program_type,)
+        query += " ORDER BY l.name, l.id, lc.category_id"
+
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+
+        lenders = []
+        current_id = None
+        criteria = None
+        for lender_id, name, program_type, category_id, criterion_name, value in cursor:
+            if lender_id != current_id:
+                current_id = lender_id
+                criteria = []
+                lenders.append((lender_id, name, program_type, criteria))
+            # Criteria without a lender value are never scored
+            if criterion_name is not None and value:
+                criteria.append(CompiledCriterion(criterion_name, value, category_id, lender_id))
+
+        compiled = [CompiledLender(*lender) for lender in lenders]
+        return cls(compiled, version, time.perf_counter() - start)
+
+    def __len__(self):
+        return len(self.lenders)
+
+    def __iter__(self):
+        return iter(self.lenders)
+
+    def get(self, lender_id):
+        """Return the compiled lender with the given ID, or None."""
+        return self.by_id.get(lender_id)
+
+    def select(self, program_type=None):
+        """
+        Return the lenders offering a program type, in name order.
+
+        Args:
+            program_type (str): Program type to filter on, or None for all lenders
+
+        Returns:
+            tuple: Matching CompiledLender objects
+        """
+        if program_type is None:
+            return self.lenders
+        selected = self.by_program_type.get(program_type)
+        if selected is None:
+            selected = tuple(lender for lender in self.lenders if lender.program_type == program_type)
+            self.by_program_type[program_type] = selected
+        return selected
+
+    def restriction_index(self, name):
+        """
+        Return the index of restricted values for a restriction criterion, building it on first use.
+
+        Args:
+            name (str): Restriction criterion name, e.g. 'restricted_industries'
+
+        Returns:
+            RestrictionIndex: Reverse index from restricted items to lender IDs
+        """
+        index = self.restriction_indexes.get(name)
+        if index is None:
+            index = RestrictionIndex((lender.id, criterion) for lender in self.lenders
+                                     for criterion in lender.criteria if criterion.name == name)
+            self.restriction_indexes[name] = index
+        return index
+
+    def arrays(self, program_type=None):
+        """
+        Return the NumPy threshold arrays for a program type, building them on first use.
+
+        Args:
+            program_type (str): Program type to filter on, or None for all lenders
+
+        Returns:
+            LenderArrays: Column-per-lender threshold arrays
+        """
+        arrays = self.lender_arrays.get(program_type)
+        if arrays is None:
+            arrays = LenderArrays(self.select(program_type))
+            self.lender_arrays[program_type] = arrays
+        return arrays
+
+    def stats(self):
+        """Return build statistics for the catalog."""
+        return {
+            'version': self.version,
+            'lenders': len(self.lenders),
+            'criteria': sum(len(lender.criteria) for lender in self.lenders),
+            'parse_errors': sum(1 for lender in self.lenders
+                                for criterion in lender.criteria if criterion.error),
+            'unparsed_state_lists': sum(1 for lender in self.lenders
+                                        for criterion in lender.criteria if criterion.unparsed),
+            'build_ms': round(self.build_seconds * 1000, 3),
+            'memory_bytes': self.memory_bytes
+        }
+
+
+class LenderArrays:
+    """
+    Lender thresholds laid out as NumPy arrays with one column per lender.
+
+    Numeric thresholds that are missing or could not be parsed are stored as
+    NaN, so every comparison against them is False just like the scalar path.
+    """
+
+    def __init__(self, lenders):
+        """
+        Build the arrays for a sequence of compiled lenders.
+
+        Args:
+            lenders (tuple): CompiledLender objects, in column order
+        """
+        self.lenders = tuple(lenders)
+        self.ids = np.array([lender.id for lender in self.lenders], dtype=np.int64)
+
+        # Scores are summed in category order, the same order the scalar path uses
+        category_ids = {}
+        for lender in self.lenders:
+            for criterion in lender.criteria:
+                category_ids[criterion.name] = criterion.category_id
+        self.categories = sorted(category_ids, key=lambda name: (category_ids[name] is None,
+                                                                  category_ids[name], name))
+
+        count = len(self.lenders)
+        self.present = {}
+        self.low = {}
+        self.high = {}
+        self.criteria = {}
+        self.masks = {}
+        self.texts = {}
+
+        for name in self.categories:
+            present = np.zeros(count, dtype=bool)
+            low = np.full(count, np.nan)
+            high = np.full(count, np.nan)
+            criteria = [None] * count
+            masks = np.zeros(count, dtype=np.uint64)
+            texts = [None] * count
+
+            for column, lender in enumerate(self.lenders):
+                criterion = next((c for c in lender.criteria if c.name == name), None)
+                if criterion is None:
+                    continue
+                present[column] = True
+                criteria[column] = criterion
+                if criterion.error is not None:
+                    continue
+                if criterion.kind == 'generic':
+                    texts[column] = criterion.text
+                elif criterion.kind == 'state':
+                    masks[column] = criterion.mask
+                elif criterion.kind == 'credit':
+                    # Requirements without an upper bound accept any higher score
+                    low[column] = criterion.low
+                    high[column] = criterion.high if criterion.high is not None else np.inf
+                elif criterion.kind in CLIENT_PARSERS:
+                    low[column] = criterion.low if criterion.low is not None else np.nan
+                    high[column] = criterion.high if criterion.high is not None else np.nan
+
+            self.present[name] = present
+            self.low[name] = low
+            self.high[name] = high
+            self.criteria[name] = criteria
+            self.masks[name] = masks
+            self.texts[name] = texts
+
+    def __len__(self):
+        return len(self.lenders)
+
+    def name(self, column):
+        """Return the name of the lender in a column."""
+        return self.lenders[column].name
+
+    def program_type(self, column):
+        """Return the program type of the lender in a column."""
+        return self.lenders[column].program_type
+
+    def text_matches(self, name, value):
+        """Return which lenders' generic criterion text matches a client value."""
+        value_lower = value.lower()
+        return np.array([text is not None and (value_lower in text or text in value_lower)
+                         for text in self.texts[name]], dtype=bool)
+
+    def not_restricted(self, name, profile):
+        """Return which lenders do not restrict the client's value for a restriction criterion."""
+        restricting = profile.restricting_lenders(name)
+        if restricting is None:
+            # Without a catalog to look the value up in, scan each lender's list
+            value = profile.get(name)
+            return np.array([criterion is None or criterion.matches_text(value)
+                             for criterion in self.criteria[name]], dtype=bool)
+        return ~np.isin(self.ids, np.fromiter(restricting, dtype=np.int64, count=len(restricting)))
+
+    def weight(self, name):
+        """Return the weight of a criteria category."""
+        return CRITERIA_WEIGHTS.get(name, DEFAULT_WEIGHT)
+
+    def kind(self, name):
+        """Return how a criteria category is compared."""
+        return CRITERION_KINDS.get(name, 'generic')
+
+
+def deep_sizeof(obj, seen=None):
+    """Approximate the memory used by an object graph in bytes."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, '__slots__'):
+        size += sum(deep_sizeof(getattr(obj, slot), seen)
+                    for slot in obj.__slots__ if hasattr(obj, slot))
+    return size
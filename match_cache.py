@@ -0,0 +1,129 @@
+"""
+BrokerBuddy Match Cache
+
+This module caches ranked match lists so repeated views of the same client
+profile do not re-run the matching engine. Entries are keyed by a canonical
+hash of the client data and the lender catalog version, so any change to the
+lender data makes older entries unreachable.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from lender_catalog import deep_sizeof
+
+
+class MatchCache:
+    """Thread-safe LRU cache with a time-to-live and a memory cap."""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=300):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes (int): Approximate memory the cached match lists may use
+            ttl (float): Seconds an entry stays valid, or 0 to never expire
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, size, matches)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(client_data, catalog, program_type=None, strict=False, limit=None, details=True):
+        """
+        Build a canonical cache key for a client profile.
+
+        Only fields that some lender criterion uses, and that are not empty,
+        take part in the key; the matching engine ignores everything else.
+
+        Args:
+            client_data (dict): Dictionary containing client information
+            catalog (CompiledLenderCatalog): Catalog the matches come from
+            program_type (str): Program type filter applied to the matches
+            strict (bool): Whether lenders failing hard requirements were excluded
+            limit (int): Number of lenders the match list was cut to, if any
+            details (bool): Whether the matches include match_details
+
+        Returns:
+            str: Hex digest identifying the match list
+        """
+        normalized = {name: value for name, value in client_data.items()
+                      if name in catalog.criterion_names and value}
+        payload = json.dumps([catalog.version, program_type, strict, limit, details, normalized],
+                             sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Return the cached match list for a key, or None.
+
+        The returned list is shared between callers and must not be modified.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, size, matches = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return matches
+
+    def put(self, key, matches):
+        """Cache a match list, evicting least recently used entries to stay under the memory cap."""
+        size = deep_sizeof(matches)
+        if size > self.max_bytes:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (expires_at, size, matches)
+            self.size += size
+
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def clear(self):
+        """Remove every entry."""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        expires_at, size, matches = self.entries.pop(key)
+        self.size -= size
+
+    def stats(self):
+        """Return cache counters."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
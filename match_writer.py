@@ -0,0 +1,162 @@
+"""
+BrokerBuddy Match Writer
+
+This module persists match results on a background thread so requests can
+return before their matches are written. Results submitted by many requests
+are grouped into one transaction per batch, and a bounded queue pushes back on
+callers when the writer falls behind.
+"""
+
+import os
+import queue
+import threading
+import time
+
+from database_schema import BrokerBuddyDB
+from matching_engine import MatchingEngine
+
+# Queued in place of a result to make the writer thread exit
+_STOP = object()
+
+
+class MatchWriter:
+    """Write-behind queue for MatchingEngine.save_match_results."""
+
+    def __init__(self, db_path, max_pending=1000, flush_interval=1.0, max_batch=500, put_timeout=5.0):
+        """
+        Initialize the writer. The background thread starts on the first submit.
+
+        Args:
+            db_path (str): Path to the SQLite database
+            max_pending (int): Results that may wait in the queue before submit blocks
+            flush_interval (float): Seconds to keep collecting a batch after its first result
+            max_batch (int): Most results written in one transaction
+            put_timeout (float): Seconds submit waits for room in a full queue
+        """
+        self.db_path = db_path
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.put_timeout = put_timeout
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+        self.pid = None
+        self.queue = None
+        self.thread = None
+
+    def _ensure_started(self):
+        with self.lock:
+            # Threads do not survive a fork, so each worker process starts its own
+            # queue; results queued in the parent are the parent's to write
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.queue = queue.Queue(maxsize=self.max_pending)
+                self.thread = None
+            # A stopped writer is restarted on the same queue so nothing pending is lost
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='match-writer', daemon=True)
+                self.thread.start()
+
+    def submit(self, client_id, matches):
+        """
+        Queue a client's matches to be saved.
+
+        Blocks for up to put_timeout seconds while the queue is full.
+
+        Args:
+            client_id (int): ID of the client
+            matches (list): List of match dictionaries
+
+        Returns:
+            bool: True if queued, False if the queue stayed full and the caller
+                must save the matches itself
+        """
+        self._ensure_started()
+        try:
+            self.queue.put((client_id, matches), timeout=self.put_timeout)
+        except queue.Full:
+            with self.lock:
+                self.rejected += 1
+            return False
+
+        with self.lock:
+            self.submitted += 1
+        return True
+
+    def flush(self):
+        """Wait until every queued result has been written."""
+        if self.pid == os.getpid() and self.thread.is_alive():
+            self.queue.join()
+
+    def close(self):
+        """Write everything still queued and stop the background thread."""
+        if self.pid == os.getpid() and self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+
+    def _run(self):
+        db = BrokerBuddyDB(self.db_path)
+        db.connect()
+        engine = MatchingEngine(db.conn)
+        try:
+            stopping = False
+            while not stopping:
+                item = self.queue.get()
+                batch = [item]
+
+                # Keep collecting until the interval passes or the batch is full
+                deadline = time.monotonic() + self.flush_interval
+                while item is not _STOP and len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self.queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    batch.append(item)
+
+                stopping = batch[-1] is _STOP
+                self._write(engine, [item for item in batch if item is not _STOP])
+                for _ in batch:
+                    self.queue.task_done()
+        finally:
+            db.close()
+            BrokerBuddyDB.close_pool()
+
+    def _write(self, engine, batch):
+        if not batch:
+            return
+
+        # A client submitted twice in one batch keeps only its latest matches
+        results = {}
+        for client_id, matches in batch:
+            results.pop(client_id, None)
+            results[client_id] = matches
+
+        saved = engine.save_many_match_results(results)
+        with self.lock:
+            self.batches += 1
+            if saved:
+                self.written += len(batch)
+            else:
+                self.failed += len(batch)
+
+    def stats(self):
+        """Return writer counters."""
+        with self.lock:
+            running = self.pid == os.getpid() and self.thread.is_alive()
+            return {
+                'running': running,
+                'pending': self.queue.qsize() if running else 0,
+                'max_pending': self.max_pending,
+                'submitted': self.submitted,
+                'written': self.written,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'batches': self.batches
+            }
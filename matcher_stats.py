@@ -0,0 +1,144 @@
+"""
+BrokerBuddy Matcher Statistics
+
+This module profiles the matching engine per criterion and per lender. A
+sample of requests is re-evaluated criterion by criterion with each
+evaluation timed, counting how often a lender's value or the client's value
+could not be parsed. Unsampled requests pay nothing, and the lender values
+that never parse are listed straight from the compiled catalog.
+"""
+
+import random
+import threading
+import time
+
+from lender_catalog import CLIENT_PARSERS
+
+
+def _new_totals():
+    return {'evaluations': 0, 'seconds': 0.0, 'lender_parse_failures': 0, 'client_parse_failures': 0}
+
+
+class MatcherStats:
+    """Evaluation counts, time and parse failures per criterion and per lender."""
+
+    def __init__(self, sample_rate=0.01):
+        """
+        Initialize the counters.
+
+        Args:
+            sample_rate (float): Fraction of requests profiled, from 0 (off) to 1 (every request)
+        """
+        self.sample_rate = sample_rate
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clear every counter."""
+        with self.lock:
+            self.requests = 0
+            self.started_at = time.time()
+            self.criteria = {}
+            self.lenders = {}
+
+    def should_sample(self):
+        """Return True if the current request should be profiled."""
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def profile(self, lenders, client):
+        """
+        Evaluate every criterion of every lender for one client, timing each.
+
+        Args:
+            lenders (iterable): CompiledLender objects scored for the request
+            client (ClientProfile): The request's parsed client data
+        """
+        criteria = {}
+        lender_totals = {}
+        perf_counter = time.perf_counter
+
+        for lender in lenders:
+            lender_entry = None
+            for criterion in lender.criteria:
+                if not client.get(criterion.name):
+                    continue
+
+                start = perf_counter()
+                criterion.test(client)
+                elapsed = perf_counter() - start
+
+                lender_failed = criterion.error is not None
+                client_failed = (criterion.kind in CLIENT_PARSERS and
+                                 client.number(criterion.name)[1] is not None)
+
+                entry = criteria.get(criterion.name)
+                if entry is None:
+                    entry = criteria[criterion.name] = _new_totals()
+                if lender_entry is None:
+                    lender_entry = lender_totals[lender.id] = dict(_new_totals(), name=lender.name,
+                                                                   failing_values={})
+                for totals in (entry, lender_entry):
+                    totals['evaluations'] += 1
+                    totals['seconds'] += elapsed
+                    totals['lender_parse_failures'] += lender_failed
+                    totals['client_parse_failures'] += client_failed
+                if lender_failed:
+                    lender_entry['failing_values'][criterion.name] = criterion.value
+
+        with self.lock:
+            self.requests += 1
+            for name, entry in criteria.items():
+                totals = self.criteria.setdefault(name, _new_totals())
+                for key in ('evaluations', 'seconds', 'lender_parse_failures', 'client_parse_failures'):
+                    totals[key] += entry[key]
+            for lender_id, entry in lender_totals.items():
+                totals = self.lenders.setdefault(lender_id, dict(_new_totals(), name=entry['name'],
+                                                                 failing_values={}))
+                for key in ('evaluations', 'seconds', 'lender_parse_failures', 'client_parse_failures'):
+                    totals[key] += entry[key]
+                totals['failing_values'].update(entry['failing_values'])
+
+    def snapshot(self, catalog=None, top=50):
+        """
+        Return the counters, slowest first.
+
+        Args:
+            catalog (CompiledLenderCatalog): If given, also list every lender
+                value in the catalog that could not be parsed
+            top (int): Most lenders listed
+
+        Returns:
+            dict: requests profiled, per-criterion totals, the lenders with the
+                most evaluation time, and the unparseable lender values
+        """
+        with self.lock:
+            criteria = [dict(totals, criterion=name) for name, totals in self.criteria.items()]
+            lenders = [dict(totals, lender_id=lender_id, failing_values=dict(totals['failing_values']))
+                       for lender_id, totals in self.lenders.items()]
+            requests = self.requests
+            started_at = self.started_at
+
+        for entry in criteria + lenders:
+            entry['mean_us'] = round(entry['seconds'] / entry['evaluations'] * 1e6, 3) if entry['evaluations'] else 0
+            entry['seconds'] = round(entry['seconds'], 6)
+        criteria.sort(key=lambda entry: entry['seconds'], reverse=True)
+        lenders.sort(key=lambda entry: (entry['lender_parse_failures'], entry['seconds']), reverse=True)
+
+        unparsed = []
+        if catalog is not None:
+            unparsed = [{
+                'lender_id': lender.id,
+                'lender_name': lender.name,
+                'criterion': criterion.name,
+                'value': criterion.value,
+                'error': criterion.error
+            } for lender in catalog for criterion in lender.criteria if criterion.error is not None]
+
+        return {
+            'sample_rate': self.sample_rate,
+            'requests_profiled': requests,
+            'since': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started_at)),
+            'criteria': criteria,
+            'lenders': lenders[:top],
+            'unparsed_lender_values': unparsed
+        }
@@ -7,55 +7,355 @@ It includes functions to match client information with lender criteria.
 
 import re
 import json
+import heapq
 import sqlite3
 from datetime import datetime
+import numpy as np
+from lender_catalog import (CompiledLenderCatalog, ClientProfile, CRITERIA_WEIGHTS,
+                            CLIENT_PROFILE_COLUMNS, parse_amount, parse_time_in_business)
 
 class MatchingEngine:
-    def __init__(self, db_connection):
-        """Initialize the matching engine with a database connection."""
+    # Criteria weights (some criteria are more important than others)
+    criteria_weights = CRITERIA_WEIGHTS
+    
+    def __init__(self, db_connection, catalog=None, shared=None):
+        """
+        Initialize the matching engine with a database connection.
+        
+        Args:
+            db_connection (sqlite3.Connection): Database connection, which the
+                engine uses but does not own; may be None when a catalog is given
+            catalog (CompiledLenderCatalog): Optional pre-built lender catalog to
+                share between engines; built from the database on first use if omitted
+            shared (SharedCatalogFile): Optional memory-mapped lender arrays that
+                find_matching_lenders scores from when no match details are needed
+        """
         self.conn = db_connection
-        self.conn.row_factory = sqlite3.Row
-        self.cursor = self.conn.cursor()
+        self.cursor = None
+        if self.conn is not None:
+            self.cursor = self.conn.cursor()
+            self.cursor.row_factory = sqlite3.Row
+        self.catalog = catalog
+        self.shared = shared
+        self.lenders_scored = 0  # Lenders considered by find_matching_lenders, for metrics
         
-    def find_matching_lenders(self, client_data):
+    def get_catalog(self):
+        """
+        Get the compiled lender catalog, building it on first use.
+        
+        Returns:
+            CompiledLenderCatalog: Lenders with their criteria pre-parsed
+        """
+        if self.catalog is None:
+            self.catalog = CompiledLenderCatalog.build(self.conn)
+        return self.catalog
+        
+    def find_matching_lenders(self, client_data, program_type=None, strict=False, limit=None,
+                              details=True):
         """
         Find lenders that match the client criteria.
         
         Args:
             client_data (dict): Dictionary containing client information
+            program_type (str): Only consider lenders of this program type
+                ('App Only' or 'Full Financials'); all lenders if None
+            strict (bool): Only score lenders whose hard numeric requirements
+                the client meets, as checked by eligible_lender_ids
+            limit (int): Only return the best this many lenders; the result is
+                the same as the first `limit` entries of the full list
+            details (bool): Include match_details for each lender; when False
+                only scores are computed and explain() gives the details later
             
         Returns:
             list: List of dictionaries with matching lenders and scores
         """
-        # Get all lenders
-        self.cursor.execute("""
-            SELECT id, name, program_type
-            FROM lenders
-            ORDER BY name
-        """)
-        lenders = self.cursor.fetchall()
+        if self.shared is not None and not details:
+            return self.rank_lenders(self.shared.arrays(program_type), client_data, program_type,
+                                     strict, limit)
         
+        catalog = self.get_catalog()
+        client = ClientProfile(client_data, catalog)
         matches = []
         
+        lenders = catalog.select(program_type)
+        if strict:
+            eligible = set(self.eligible_lender_ids(client_data, program_type))
+            lenders = [lender for lender in lenders if lender.id in eligible]
+        self.lenders_scored += len(lenders)
+        if limit is not None:
+            lenders = self.top_lenders(lenders, client, limit)
+        
         for lender in lenders:
             # Calculate match score for this lender
-            match_score, match_details = self.calculate_match_score(lender['id'], client_data)
+            if details:
+                match_score, match_details = self.score_lender(lender, client)
+            else:
+                match_score = self.score_only(lender, client)
             
             # Only include lenders with a positive match score
             if match_score > 0:
-                matches.append({
-                    'lender_id': lender['id'],
-                    'lender_name': lender['name'],
-                    'program_type': lender['program_type'],
-                    'match_score': match_score,
-                    'match_details': match_details
-                })
+                match = {
+                    'lender_id': lender.id,
+                    'lender_name': lender.name,
+                    'program_type': lender.program_type,
+                    'match_score': match_score
+                }
+                if details:
+                    match['match_details'] = match_details
+                matches.append(match)
         
         # Sort matches by score (highest first)
         matches.sort(key=lambda x: x['match_score'], reverse=True)
         
         return matches
     
+    def rank_lenders(self, arrays, client_data, program_type=None, strict=False, limit=None):
+        """
+        Rank lenders by score from their threshold arrays, without match details.
+        
+        Gives the same list as find_matching_lenders with details=False, but
+        needs only the arrays, such as the ones mapped from a shared catalog file.
+        
+        Args:
+            arrays (LenderArrays): Arrays of the lenders offering the program
+                type, or None if there are none
+            client_data (dict): Dictionary containing client information
+            program_type (str): Program type the arrays were selected for
+            strict (bool): Only rank lenders returned by eligible_lender_ids
+            limit (int): Only return the best this many lenders
+            
+        Returns:
+            list: List of dictionaries with matching lenders and scores
+        """
+        if arrays is None:
+            return []
+        
+        scores = self._score_chunk(arrays, [ClientProfile(client_data, self.catalog)])[0]
+        ranked = scores > 0
+        if strict:
+            eligible = np.isin(arrays.ids, np.array(self.eligible_lender_ids(client_data, program_type),
+                                                    dtype=np.int64))
+            ranked &= eligible
+            self.lenders_scored += int(eligible.sum())
+        else:
+            self.lenders_scored += len(arrays)
+        
+        # A stable sort keeps lenders with equal scores in catalog order, like list.sort
+        columns = np.flatnonzero(ranked)
+        columns = columns[np.argsort(-scores[columns], kind='stable')]
+        if limit is not None:
+            columns = columns[:max(limit, 0)]
+        
+        return [{
+            'lender_id': int(arrays.ids[column]),
+            'lender_name': arrays.name(column),
+            'program_type': arrays.program_type(column),
+            'match_score': float(scores[column])
+        } for column in columns.tolist()]
+    
+    def top_lenders(self, lenders, client, limit):
+        """
+        Find the highest scoring lenders without building match details.
+        
+        Keeps the best `limit` lenders seen so far in a heap. A lender stops
+        being evaluated as soon as the criteria it has already failed make it
+        impossible to beat the weakest lender in the heap.
+        
+        Args:
+            lenders (list): Compiled lenders in catalog order
+            client (ClientProfile): Client data with parsed numeric values
+            limit (int): Number of lenders to keep
+            
+        Returns:
+            list: The best lenders in catalog order, ties going to the earlier one
+        """
+        if limit <= 0:
+            return []
+        
+        heap = []  # (score, -position) of the best lenders so far, weakest first
+        for position, lender in enumerate(lenders):
+            # Weigh only the criteria the client has a value for, in catalog order
+            # so the total is the same float score_lender divides by
+            max_possible_score = 0
+            for criterion in lender.criteria:
+                if client.get(criterion.name):
+                    max_possible_score += criterion.weight
+            if max_possible_score <= 0:
+                continue
+            
+            # Lenders must score above zero, and once the heap is full they must
+            # beat its weakest entry; later lenders lose ties to earlier ones
+            threshold = heap[0][0] if len(heap) >= limit else 0
+            lost = 0
+            failed = []
+            for criterion in lender.criteria_by_weight:
+                if not client.get(criterion.name) or criterion.test(client):
+                    continue
+                failed.append(criterion)
+                lost += criterion.weight
+                # Allow for rounding between the two ways of summing the weights
+                if (max_possible_score - lost) / max_possible_score * 100 < threshold - 1e-9:
+                    break
+            else:
+                score = 0
+                for criterion in lender.criteria:
+                    if client.get(criterion.name) and criterion not in failed:
+                        score += criterion.weight
+                percentage_score = score / max_possible_score * 100
+                
+                entry = (percentage_score, -position)
+                if percentage_score <= 0:
+                    continue
+                if len(heap) < limit:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+        
+        return [lenders[-position] for _, position in sorted(heap, key=lambda entry: -entry[1])]
+    
+    def eligible_lender_ids(self, client_data, program_type=None):
+        """
+        Find lenders whose hard numeric requirements the client meets.
+        
+        Runs a single indexed query against lender_profiles: the client's amount
+        must be within the lender's range, its credit scores and time in business
+        at or above the minimums, and its equipment no older than the maximum.
+        Thresholds the lender does not set, and client values that are missing
+        or unparseable, do not exclude anyone.
+        
+        Args:
+            client_data (dict): Dictionary containing client information
+            program_type (str): Only consider lenders of this program type
+            
+        Returns:
+            list: IDs of the eligible lenders
+        """
+        client = ClientProfile(client_data)
+        conditions = []
+        params = []
+        
+        def require(name, column, operator):
+            value, error = client.number(name)
+            if error is None:
+                conditions.append(f"(p.{column} IS NULL OR p.{column} {operator} ?)")
+                params.append(value)
+        
+        require('amount_considered', 'min_amount', '<=')
+        require('amount_considered', 'max_amount', '>=')
+        require('personal_credit', 'min_personal_credit', '<=')
+        require('personal_credit', 'max_personal_credit', '>=')
+        require('business_credit', 'min_business_credit', '<=')
+        require('business_credit', 'max_business_credit', '>=')
+        require('time_in_business', 'min_tib_months', '<=')
+        require('collateral_age', 'max_collateral_years', '>=')
+        
+        if program_type is not None:
+            conditions.append("l.program_type = ?")
+            params.append(program_type)
+        
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT p.lender_id
+            FROM lender_profiles p
+            JOIN lenders l ON l.id = p.lender_id
+            {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+        """, params)
+        return [row[0] for row in cursor.fetchall()]
+    
+    def find_matching_clients(self, lender_id):
+        """
+        Find the saved clients a lender would accept.
+        
+        Clients are first narrowed with a single indexed query on client_profiles:
+        the client's amount must be within the lender's range, its credit scores
+        within the lender's requirements, its time in business at or above the
+        minimum, its equipment no older than the maximum and its state not
+        restricted. Client values that are missing or unparseable, and lender
+        thresholds that are not set, do not exclude anyone. The remaining clients
+        must not be in a restricted industry or have restricted equipment, and
+        are ranked by their match score with the lender.
+        
+        Args:
+            lender_id (int): ID of the lender
+            
+        Returns:
+            list: Dictionaries with client_id, client_name and match_score,
+                highest score first
+        """
+        catalog = self.get_catalog()
+        lender = catalog.get(lender_id)
+        if lender is None:
+            return []
+        
+        conditions = []
+        params = []
+        
+        def require(criterion, operator, threshold):
+            column = CLIENT_PROFILE_COLUMNS[criterion.name]
+            if threshold is not None and threshold != float('inf'):
+                conditions.append(f"(p.{column} IS NULL OR p.{column} {operator} ?)")
+                params.append(threshold)
+        
+        for criterion in lender.criteria:
+            if criterion.error is not None:
+                continue
+            if criterion.kind in ('amount', 'credit'):
+                require(criterion, '>=', criterion.low)
+                require(criterion, '<=', criterion.high)
+            elif criterion.kind == 'time_in_business':
+                require(criterion, '>=', criterion.low)
+            elif criterion.kind == 'collateral_age':
+                require(criterion, '<=', criterion.high)
+            elif criterion.kind == 'state' and criterion.mask:
+                conditions.append("(p.state_mask IS NULL OR (p.state_mask & ?) = 0)")
+                params.append(criterion.mask)
+        
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT p.client_id
+            FROM client_profiles p
+            {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+        """, params)
+        candidates = [row[0] for row in cursor.fetchall()]
+        
+        restrictions = [criterion for criterion in lender.criteria if criterion.kind == 'restriction']
+        prospects = []
+        for client_id, client_name, client_data in self._load_clients(candidates):
+            client = ClientProfile(client_data, catalog)
+            if not all(criterion.test(client) for criterion in restrictions if client.get(criterion.name)):
+                continue
+            match_score = self.score_only(lender, client)
+            if match_score > 0:
+                prospects.append({
+                    'client_id': client_id,
+                    'client_name': client_name,
+                    'match_score': match_score
+                })
+        
+        prospects.sort(key=lambda x: x['match_score'], reverse=True)
+        
+        return prospects
+    
+    def _load_clients(self, client_ids):
+        # (client_id, name, client data) for each client, ordered by name
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT cl.id, cl.name, c.name, cc.value
+            FROM clients cl
+            LEFT JOIN client_criteria cc ON cc.client_id = cl.id
+            LEFT JOIN criteria_categories c ON cc.category_id = c.id
+            WHERE cl.id IN (SELECT value FROM json_each(?))
+            ORDER BY cl.name, cl.id
+        """, (json.dumps(list(client_ids)),))
+        
+        clients = []
+        for client_id, client_name, category, value in cursor.fetchall():
+            if not clients or clients[-1][0] != client_id:
+                clients.append((client_id, client_name, {}))
+            if category is not None:
+                clients[-1][2][category] = value
+        return clients
+    
     def calculate_match_score(self, lender_id, client_data):
         """
         Calculate a match score between a lender and client data.
@@ -67,113 +367,203 @@ class MatchingEngine:
         Returns:
             tuple: (match_score, match_details)
         """
-        # Get lender criteria
-        self.cursor.execute("""
-            SELECT c.name, c.description, lc.value
-            FROM lender_criteria lc
-            JOIN criteria_categories c ON lc.category_id = c.id
-            WHERE lc.lender_id = ?
-        """, (lender_id,))
-        lender_criteria = self.cursor.fetchall()
+        catalog = self.get_catalog()
+        lender = catalog.get(lender_id)
+        if lender is None:
+            return 0, []
+        
+        return self.score_lender(lender, ClientProfile(client_data, catalog))
+    
+    def score_lender(self, lender, client):
+        """
+        Score a compiled lender against parsed client data.
         
+        Args:
+            lender (CompiledLender): Lender with pre-parsed criteria
+            client (ClientProfile): Client data with parsed numeric values
+            
+        Returns:
+            tuple: (match_score, match_details)
+        """
         # Initialize score and details
         score = 0
         max_possible_score = 0
         details = []
         
-        # Define criteria weights (some criteria are more important than others)
-        criteria_weights = {
-            'amount_considered': 2.0,
-            'time_in_business': 1.5,
-            'personal_credit': 1.5,
-            'business_credit': 1.0,
-            'bank_statements': 1.0,
-            'collateral_age': 1.0,
-            'titled_vehicles': 0.8,
-            'restricted_industries': 1.2,
-            'restricted_equipment': 1.2,
-            'state_restrictions': 1.5,
-            'startups': 0.8,
-            'special_products': 0.5,
-            'paynet': 0.8,
-            'special_deals': 0.5
-        }
-        
-        # Default weight for criteria not in the weights dictionary
-        default_weight = 1.0
-        
         # Check each criterion
-        for criterion in lender_criteria:
-            criterion_name = criterion['name']
-            criterion_value = criterion['value']
-            client_value = client_data.get(criterion_name, '')
-            
-            # Skip if no client value or lender value
-            if not client_value or not criterion_value:
+        for criterion in lender.criteria:
+            # Skip if no client value (criteria without a lender value are not compiled)
+            if not client.get(criterion.name):
                 continue
             
-            # Get weight for this criterion
-            weight = criteria_weights.get(criterion_name, default_weight)
-            
-            # Different matching logic based on criterion type
-            match_result = False
-            reason = ''
-            
-            if criterion_name == 'amount_considered':
-                # Check if client amount is within lender's range
-                match_result, reason = self.match_amount(client_value, criterion_value)
-            elif criterion_name == 'time_in_business':
-                # Check if client's time in business meets lender's requirement
-                match_result, reason = self.match_time_in_business(client_value, criterion_value)
-            elif criterion_name == 'personal_credit' or criterion_name == 'business_credit':
-                # Check if client's credit score meets lender's requirement
-                match_result, reason = self.match_credit_score(client_value, criterion_value)
-            elif criterion_name == 'collateral_age':
-                # Check if equipment age meets lender's requirement
-                match_result, reason = self.match_collateral_age(client_value, criterion_value)
-            elif criterion_name == 'restricted_industries':
-                # Check if client's industry is restricted
-                match_result, reason = self.match_not_restricted(client_value, criterion_value)
-                # Invert result since we want to match when NOT restricted
-                match_result = not match_result
-            elif criterion_name == 'restricted_equipment':
-                # Check if client's equipment type is restricted
-                match_result, reason = self.match_not_restricted(client_value, criterion_value)
-                # Invert result since we want to match when NOT restricted
-                match_result = not match_result
-            elif criterion_name == 'state_restrictions':
-                # Check if client's state is restricted
-                match_result, reason = self.match_not_restricted(client_value, criterion_value)
-                # Invert result since we want to match when NOT restricted
-                match_result = not match_result
-            else:
-                # Generic string matching for other criteria
-                match_result = self.generic_match(client_value, criterion_value)
-                reason = f"Client: {client_value}, Lender: {criterion_value}"
+            match_result, reason = criterion.evaluate(client)
             
             # Update score and details
-            max_possible_score += weight
+            max_possible_score += criterion.weight
             if match_result:
-                score += weight
-                details.append({
-                    'criterion': criterion_name,
-                    'result': 'Match',
-                    'reason': reason,
-                    'weight': weight
-                })
-            else:
-                details.append({
-                    'criterion': criterion_name,
-                    'result': 'No Match',
-                    'reason': reason,
-                    'weight': weight
-                })
+                score += criterion.weight
+            details.append({
+                'criterion': criterion.name,
+                'result': 'Match' if match_result else 'No Match',
+                'reason': reason,
+                'weight': criterion.weight
+            })
         
         # Calculate percentage score if there were any criteria to match
         percentage_score = (score / max_possible_score * 100) if max_possible_score > 0 else 0
         
         return percentage_score, details
     
+    def score_only(self, lender, client):
+        """
+        Score a compiled lender without building match details.
+        
+        Args:
+            lender (CompiledLender): Lender with pre-parsed criteria
+            client (ClientProfile): Client data with parsed numeric values
+            
+        Returns:
+            float: The same match score score_lender returns
+        """
+        score = 0
+        max_possible_score = 0
+        
+        for criterion in lender.criteria:
+            if not client.get(criterion.name):
+                continue
+            max_possible_score += criterion.weight
+            if criterion.test(client):
+                score += criterion.weight
+        
+        return (score / max_possible_score * 100) if max_possible_score > 0 else 0
+    
+    def explain(self, lender_id, client_data):
+        """
+        Explain how a client was scored against one lender.
+        
+        Meant to be called for the few lenders a user actually looks at, after
+        find_matching_lenders was run with details=False.
+        
+        Args:
+            lender_id (int): ID of the lender
+            client_data (dict): Dictionary containing client information
+            
+        Returns:
+            list: Match details, one dictionary per criterion with the
+                criterion, result, reason and weight; empty if the lender is unknown
+        """
+        return self.calculate_match_score(lender_id, client_data)[1]
+    
+    def score_matrix(self, clients, program_type=None, chunk_size=1024):
+        """
+        Score many clients against every lender at once using NumPy broadcasting.
+        
+        Each score is identical to what calculate_match_score returns for the
+        same client and lender.
+        
+        Args:
+            clients (list): List of client data dictionaries
+            program_type (str): Only score lenders of this program type
+            chunk_size (int): Number of clients scored per block, bounding the
+                size of the intermediate arrays
+            
+        Returns:
+            tuple: (lenders, scores) where lenders is a tuple of CompiledLender
+                objects and scores[i, j] is the score of clients[i] for lenders[j]
+        """
+        catalog = self.get_catalog()
+        arrays = catalog.arrays(program_type)
+        profiles = [ClientProfile(client_data, catalog) for client_data in clients]
+        scores = np.zeros((len(profiles), len(arrays)))
+        
+        for start in range(0, len(profiles), chunk_size):
+            chunk = profiles[start:start + chunk_size]
+            scores[start:start + len(chunk)] = self._score_chunk(arrays, chunk)
+        
+        return arrays.lenders, scores
+    
+    def _score_chunk(self, arrays, profiles):
+        """Compute the weighted score matrix for a block of clients."""
+        score = np.zeros((len(profiles), len(arrays)))
+        max_possible_score = np.zeros_like(score)
+        
+        # Accumulate category by category in the same order as the scalar path
+        # so the floating point sums are bit-for-bit identical
+        for name in arrays.categories:
+            has_value = np.array([bool(profile.get(name)) for profile in profiles])
+            if not has_value.any():
+                continue
+            
+            active = has_value[:, None] & arrays.present[name][None, :]
+            matched = active & self._match_column(arrays, name, profiles)
+            weight = arrays.weight(name)
+            
+            np.add(max_possible_score, weight, out=max_possible_score, where=active)
+            np.add(score, weight, out=score, where=matched)
+        
+        # Calculate percentage score where there were any criteria to match
+        percentage_score = np.zeros_like(score)
+        np.divide(score, max_possible_score, out=percentage_score, where=max_possible_score > 0)
+        percentage_score *= 100
+        
+        return percentage_score
+    
+    def _match_column(self, arrays, name, profiles):
+        """Evaluate one criteria category for a block of clients against all lenders."""
+        kind = arrays.kind(name)
+        
+        if kind == 'restriction':
+            # Find the lenders restricting each distinct client value once
+            rows = {}
+            table = [np.zeros(len(arrays), dtype=bool)]
+            index = np.zeros(len(profiles), dtype=np.intp)
+            for i, profile in enumerate(profiles):
+                value = profile.get(name)
+                if not value:
+                    continue
+                row = rows.get(value)
+                if row is None:
+                    row = rows[value] = len(table)
+                    table.append(arrays.not_restricted(name, profile))
+                index[i] = row
+            return np.stack(table)[index]
+        
+        if kind == 'generic':
+            # String criteria are evaluated once per distinct client value
+            rows = {}
+            table = [np.zeros(len(arrays), dtype=bool)]
+            index = np.zeros(len(profiles), dtype=np.intp)
+            for i, profile in enumerate(profiles):
+                value = profile.get(name)
+                if not value:
+                    continue
+                row = rows.get(value)
+                if row is None:
+                    row = rows[value] = len(table)
+                    table.append(arrays.text_matches(name, value))
+                index[i] = row
+            return np.stack(table)[index]
+        
+        if kind == 'state':
+            # One bitwise AND per client and lender; unrestricted lenders have an empty mask
+            client_masks = np.array([profile.number(name)[0] or 0 for profile in profiles],
+                                    dtype=np.uint64)[:, None]
+            return (client_masks & arrays.masks[name][None, :]) == 0
+        
+        # Client values that could not be parsed become NaN and never match
+        values = np.array([number if error is None else np.nan
+                           for number, error in (profile.number(name) for profile in profiles)],
+                          dtype=float)[:, None]
+        low = arrays.low[name][None, :]
+        high = arrays.high[name][None, :]
+        
+        if kind == 'time_in_business':
+            return values >= low
+        if kind == 'collateral_age':
+            return values <= high
+        # Amount and credit score ranges
+        return (low <= values) & (values <= high)
+    
     def match_amount(self, client_amount, lender_range):
         """
         Check if client amount is within lender's range.
@@ -213,15 +603,8 @@ class MatchingEngine:
         Returns:
             float: Parsed amount in dollars
         """
-        amount_str = amount_str.strip().lower()
-        
-        if 'k' in amount_str:
-            return float(amount_str.replace('k', '')) * 1000
-        elif 'm' in amount_str:
-            return float(amount_str.replace('m', '')) * 1000000
-        else:
-            return float(amount_str)
-    
+        return parse_amount(amount_str)
+
     def match_time_in_business(self, client_time, lender_requirement):
         """
         Check if client's time in business meets lender's requirement.
@@ -262,19 +645,8 @@ class MatchingEngine:
         Returns:
             float: Time in months
         """
-        time_str = time_str.lower()
-        
-        if 'year' in time_str or 'yr' in time_str:
-            # Extract number of years
-            years = float(re.search(r'(\d+\.?\d*)', time_str).group(1))
-            return years * 12
-        elif 'month' in time_str or 'mo' in time_str:
-            # Extract number of months
-            return float(re.search(r'(\d+\.?\d*)', time_str).group(1))
-        else:
-            # Assume it's just a number representing years
-            return float(re.search(r'(\d+\.?\d*)', time_str).group(1)) * 12
-    
+        return parse_time_in_business(time_str)
+
     def match_credit_score(self, client_score, lender_requirement):
         """
         Check if client's credit score meets lender's requirement.
@@ -394,6 +766,172 @@ class MatchingEngine:
         # Check if client value is in lender value or vice versa
         return client_value_lower in lender_value_lower or lender_value_lower in client_value_lower
     
+    def saved_clients(self):
+        """
+        Load every saved client, including those without any match results yet.
+        
+        Returns:
+            dict: Client ID -> client data dictionary built from client_criteria
+        """
+        self.cursor.execute("""
+            SELECT cl.id AS client_id, c.name, cc.value
+            FROM clients cl
+            LEFT JOIN client_criteria cc ON cc.client_id = cl.id
+            LEFT JOIN criteria_categories c ON cc.category_id = c.id
+            ORDER BY cl.id
+        """)
+        clients = {}
+        for row in self.cursor.fetchall():
+            client_data = clients.setdefault(row['client_id'], {})
+            if row['name'] is not None:
+                client_data[row['name']] = row['value']
+        return clients
+    
+    def rematch_lender(self, lender_id, changed_categories=None):
+        """
+        Bring saved clients' matches with one lender up to date after it changed.
+        
+        Only the given categories are re-evaluated for clients whose stored
+        match has details; the stored results of every other criterion are
+        reused. Clients without stored details are scored against the lender
+        in full. Only this lender's rows in matches are written, in a single
+        transaction, and the result is the same as re-running the matcher.
+        
+        Args:
+            lender_id (int): ID of the changed lender
+            changed_categories (iterable): Names of the criteria categories whose
+                value changed, or None to re-evaluate every criterion
+            
+        Returns:
+            dict: Counts of clients evaluated, rows updated, added and removed,
+                and the IDs of the clients whose lender ranking changed
+        """
+        catalog = self.get_catalog()
+        lender = catalog.get(lender_id)
+        changed = set(changed_categories) if changed_categories is not None else None
+        
+        self.cursor.execute("""
+            SELECT client_id, match_score, match_details
+            FROM matches
+            WHERE lender_id = ?
+        """, (lender_id,))
+        stored = {row['client_id']: row for row in self.cursor.fetchall()}
+        
+        report = {'lender_id': lender_id, 'clients': 0, 'full_rescores': 0,
+                  'updated': 0, 'added': 0, 'removed': 0, 'ranking_changed': []}
+        scores = {}  # client_id -> (old score, new score) for clients whose score changed
+        updates, inserts, deletes = [], [], []
+        
+        for client_id, client_data in self.saved_clients().items():
+            report['clients'] += 1
+            client = ClientProfile(client_data, catalog)
+            row = stored.get(client_id)
+            old_score = row['match_score'] if row is not None else 0
+            
+            if lender is None:
+                match_score, match_details = 0, []
+            elif changed is None or row is None or not row['match_details']:
+                report['full_rescores'] += 1
+                match_score, match_details = self.score_lender(lender, client)
+            else:
+                reusable = {detail['criterion']: detail for detail in json.loads(row['match_details'])
+                            if detail['criterion'] not in changed}
+                match_score, match_details = self._rescore_lender(lender, client, reusable)
+            
+            if match_score > 0:
+                values = (match_score, json.dumps(match_details), client_id, lender_id)
+                if row is None:
+                    inserts.append(values)
+                elif match_score != old_score or values[1] != row['match_details']:
+                    updates.append(values)
+            elif row is not None:
+                deletes.append((client_id, lender_id))
+            
+            if match_score != old_score:
+                scores[client_id] = (old_score, match_score)
+        
+        report['ranking_changed'] = self._ranking_changes(lender_id, scores)
+        
+        try:
+            if not self.conn.in_transaction:
+                self.conn.execute("BEGIN IMMEDIATE")
+            self.cursor.executemany("""
+                UPDATE matches SET match_score = ?, match_details = ?
+                WHERE client_id = ? AND lender_id = ?
+            """, updates)
+            self.cursor.executemany("""
+                INSERT INTO matches (match_score, match_details, client_id, lender_id)
+                VALUES (?, ?, ?, ?)
+            """, inserts)
+            self.cursor.executemany("DELETE FROM matches WHERE client_id = ? AND lender_id = ?", deletes)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        
+        report['updated'] = len(updates)
+        report['added'] = len(inserts)
+        report['removed'] = len(deletes)
+        return report
+    
+    def _rescore_lender(self, lender, client, reusable):
+        # Same as score_lender, except criteria found in `reusable` are not re-evaluated
+        score = 0
+        max_possible_score = 0
+        details = []
+        
+        for criterion in lender.criteria:
+            if not client.get(criterion.name):
+                continue
+            
+            detail = reusable.get(criterion.name)
+            if detail is None or detail['weight'] != criterion.weight:
+                match_result, reason = criterion.evaluate(client)
+                detail = {
+                    'criterion': criterion.name,
+                    'result': 'Match' if match_result else 'No Match',
+                    'reason': reason,
+                    'weight': criterion.weight
+                }
+            
+            max_possible_score += criterion.weight
+            if detail['result'] == 'Match':
+                score += criterion.weight
+            details.append(detail)
+        
+        percentage_score = (score / max_possible_score * 100) if max_possible_score > 0 else 0
+        
+        return percentage_score, details
+    
+    def _ranking_changes(self, lender_id, scores):
+        # Clients whose ordered list of lenders differs once this lender's score changes
+        if not scores:
+            return []
+        
+        self.cursor.execute("""
+            SELECT client_id, lender_id, match_score
+            FROM matches
+            WHERE client_id IN (SELECT value FROM json_each(?)) AND lender_id != ?
+        """, (json.dumps(list(scores)), lender_id))
+        others = {}
+        for row in self.cursor.fetchall():
+            others.setdefault(row['client_id'], []).append((row['lender_id'], row['match_score']))
+        
+        # Equal scores keep catalog order, as in find_matching_lenders
+        positions = {lender.id: position for position, lender in enumerate(self.get_catalog())}
+        
+        def ranking(entries):
+            entries = [(lid, score) for lid, score in entries if score > 0]
+            entries.sort(key=lambda entry: (-entry[1], positions.get(entry[0], len(positions))))
+            return [lid for lid, score in entries]
+        
+        changed = []
+        for client_id, (old_score, new_score) in scores.items():
+            entries = others.get(client_id, [])
+            if ranking(entries + [(lender_id, old_score)]) != ranking(entries + [(lender_id, new_score)]):
+                changed.append(client_id)
+        return changed
+    
     def save_match_results(self, client_id, matches):
         """
         Save match results to the database.
@@ -405,22 +943,43 @@ class MatchingEngine:
         Returns:
             bool: True if successful, False otherwise
         """
+        return self.save_many_match_results({client_id: matches})
+    
+    def save_many_match_results(self, results):
+        """
+        Save match results for several clients in a single transaction.
+        
+        Each client's existing matches are replaced. Matches found without
+        match_details are stored with NULL details.
+        
+        Args:
+            results (dict): Client ID -> list of match dictionaries
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        rows = [
+            (client_id, match['lender_id'], match['match_score'],
+             json.dumps(match['match_details']) if 'match_details' in match else None)
+            for client_id, matches in results.items()
+            for match in matches
+        ]
+        
         try:
-            # Delete any existing matches for this client
-            self.cursor.execute("DELETE FROM matches WHERE client_id = ?", (client_id,))
+            # Take the write lock up front rather than upgrading halfway through
+            if not self.conn.in_transaction:
+                self.conn.execute("BEGIN IMMEDIATE")
+            
+            # Delete any existing matches for these clients
+            self.cursor.executemany("DELETE FROM matches WHERE client_id = ?",
+                                    [(client_id,) for client_id in results])
             
             # Insert new matches
-            for match in matches:
-                self.cursor.execute("""
-                    INSERT INTO matches 
-                    (client_id, lender_id, match_score, match_details) 
-                    VALUES (?, ?, ?, ?)
-                """, (
-                    client_id, 
-                    match['lender_id'], 
-                    match['match_score'], 
-                    json.dumps(match['match_details'])
-                ))
+            self.cursor.executemany("""
+                INSERT INTO matches 
+                (client_id, lender_id, match_score, match_details) 
+                VALUES (?, ?, ?, ?)
+            """, rows)
             
             self.conn.commit()
             return True
@@ -25,6 +25,17 @@ files_to_copy = [
     'database_schema.py',
     'data_importer.py',
     'matching_engine.py',
+    'lender_catalog.py',
+    'restriction_index.py',
+    'state_masks.py',
+    'match_cache.py',
+    'match_writer.py',
+    'catalog_snapshot.py',
+    'request_metrics.py',
+    'matcher_stats.py',
+    'sql_trace.py',
+    'sampling_profiler.py',
+    'shared_catalog.py',
     'requirements.txt',
     'user_guide.md',
     'maintenance_guide.md'
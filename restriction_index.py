@@ -0,0 +1,170 @@
+"""
+BrokerBuddy Restriction Index
+
+This module indexes every lender's restricted industries and restricted
+equipment lists so one pass over a client's value finds every lender that
+excludes it, instead of splitting and scanning each lender's list per request.
+
+A client value is restricted by a lender when any of the lender's restricted
+items is a substring of the client value, or the client value is a substring
+of one of the items. The first direction is answered by an Aho-Corasick
+automaton over all distinct items; the second by a single scan of the distinct
+items joined into one string.
+"""
+
+from bisect import bisect_right
+from collections import deque
+
+# Restricted items come from splitting lists on commas, so no item contains one
+ITEM_SEPARATOR = ','
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher."""
+
+    def __init__(self, patterns):
+        """
+        Build the automaton.
+
+        Args:
+            patterns (list): Non-empty pattern strings; their positions are the
+                IDs reported by find_all
+        """
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                state = next_state
+            self.output[state] += (pattern_id,)
+
+        # Breadth-first pass to set failure links and inherit their outputs
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] += self.output[self.fail[next_state]]
+
+    def find_all(self, text):
+        """
+        Return the IDs of every pattern that occurs in the text.
+
+        Args:
+            text (str): Text to scan
+
+        Returns:
+            set: Pattern IDs found
+        """
+        found = set()
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        state = 0
+
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+
+        return found
+
+
+class RestrictionIndex:
+    """Reverse index from restricted items to the lenders that restrict them."""
+
+    def __init__(self, criteria):
+        """
+        Build the index for one restriction category.
+
+        Args:
+            criteria (iterable): (lender_id, CompiledCriterion) pairs
+        """
+        item_ids = {}
+        self.item_lenders = []
+        self.always_restricted = set()  # Lenders with an empty item, which matches everything
+
+        for lender_id, criterion in criteria:
+            if criterion.unrestricted:
+                continue
+            for item in criterion.items:
+                if not item:
+                    self.always_restricted.add(lender_id)
+                    continue
+                item_id = item_ids.get(item)
+                if item_id is None:
+                    item_id = item_ids[item] = len(self.item_lenders)
+                    self.item_lenders.append(set())
+                self.item_lenders[item_id].add(lender_id)
+
+        self.items = list(item_ids)
+        self.automaton = AhoCorasick(self.items)
+
+        # Distinct items joined into one string, with the offset where each starts
+        self.haystack = ITEM_SEPARATOR.join(self.items)
+        self.starts = []
+        offset = 0
+        for item in self.items:
+            self.starts.append(offset)
+            offset += len(item) + len(ITEM_SEPARATOR)
+
+    def __len__(self):
+        return len(self.items)
+
+    def matching_items(self, client_value):
+        """
+        Find the distinct items that restrict a client value.
+
+        Args:
+            client_value (str): Client's value (industry or equipment type)
+
+        Returns:
+            set: Item IDs that are substrings of the value or contain it
+        """
+        client_value_lower = client_value.lower()
+
+        # Items that occur in the client's value
+        found = self.automaton.find_all(client_value_lower)
+
+        # Items that contain the client's value
+        if ITEM_SEPARATOR not in client_value_lower:
+            position = self.haystack.find(client_value_lower)
+            while position != -1:
+                item_id = bisect_right(self.starts, position) - 1
+                found.add(item_id)
+                next_item = item_id + 1
+                if next_item >= len(self.starts):
+                    break
+                position = self.haystack.find(client_value_lower, self.starts[next_item])
+
+        return found
+
+    def restricting_lenders(self, client_value):
+        """
+        Find every lender that restricts a client value.
+
+        Args:
+            client_value (str): Client's value (industry or equipment type)
+
+        Returns:
+            set: IDs of the lenders whose restriction list excludes the value
+        """
+        lenders = set(self.always_restricted)
+        for item_id in self.matching_items(client_value):
+            lenders.update(self.item_lenders[item_id])
+        return lenders
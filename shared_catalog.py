@@ -0,0 +1,352 @@
+"""
+BrokerBuddy Shared Catalog
+
+This module publishes everything needed to score clients against the lenders
+to one file of fixed-layout arrays, which every gunicorn worker memory-maps
+read-only. Workers score results pages and batch requests straight from the
+map, so the data lives once in the page cache however many workers run. A
+new catalog version is published by writing a complete new file and renaming
+it over the old one; requests still holding the old map keep a valid view.
+
+File layout (all integers little-endian):
+
+    header   magic "BBSC", format version (u16), reserved (u16),
+             catalog version (u64), table of contents length (u32)
+    toc      JSON list with one section per program type: its lender count,
+             categories and the dtype, offset and length of every array
+    arrays   raw array data, each aligned to 64 bytes
+
+Text columns (lender names, program types, generic criterion text and
+restricted items) are stored as an offset and length per lender into one
+UTF-8 blob, with a negative length for a missing value. Entries are separated
+by commas and restricted items are joined with commas, which never occur in
+an item, so substring searches run over the blob without decoding it.
+"""
+
+import fcntl
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from lender_catalog import CompiledLenderCatalog, LenderArrays
+
+MAGIC = b'BBSC'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHQI')
+ALIGNMENT = 64
+SEPARATOR = b','
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _section(arrays, program_type, add, add_text):
+    entries = {
+        'ids': add(arrays.ids, '<i8'),
+        'names': add_text([lender.name for lender in arrays.lenders]),
+        'program_types': add_text([lender.program_type for lender in arrays.lenders])
+    }
+    for name in arrays.categories:
+        entries[f"present/{name}"] = add(arrays.present[name], '|b1')
+        entries[f"low/{name}"] = add(arrays.low[name], '<f8')
+        entries[f"high/{name}"] = add(arrays.high[name], '<f8')
+        entries[f"masks/{name}"] = add(arrays.masks[name], '<u8')
+
+        kind = arrays.kind(name)
+        if kind == 'generic':
+            entries[f"texts/{name}"] = add_text(arrays.texts[name])
+        elif kind == 'restriction':
+            # Unrestricted lenders have no items and never restrict anyone
+            entries[f"items/{name}"] = add_text([
+                ','.join(criterion.items)
+                if criterion is not None and criterion.error is None and not criterion.unrestricted
+                else None
+                for criterion in arrays.criteria[name]])
+    return {'program_type': program_type, 'lenders': len(arrays), 'categories': arrays.categories,
+            'arrays': entries}
+
+
+def publish(catalog, path):
+    """
+    Write a catalog's scoring arrays to a shared file, replacing any existing file atomically.
+
+    Args:
+        catalog (CompiledLenderCatalog): Compiled catalog to publish
+        path (str): Shared catalog file path
+    """
+    chunks = []
+    size = 0
+
+    def add(array, dtype):
+        nonlocal size
+        data = np.ascontiguousarray(array, dtype=np.dtype(dtype)).tobytes()
+        offset = _align(size)
+        chunks.append(b'\0' * (offset - size))
+        chunks.append(data)
+        size = offset + len(data)
+        return [dtype, offset, len(array)]
+
+    def add_text(values):
+        offsets = []
+        lengths = []
+        blob = []
+        position = 0
+        for value in values:
+            offsets.append(position)
+            if value is None:
+                lengths.append(-1)
+                continue
+            encoded = value.encode('utf-8')
+            blob.append(encoded + SEPARATOR)
+            lengths.append(len(encoded))
+            position += len(encoded) + len(SEPARATOR)
+        return {'offsets': add(np.array(offsets, dtype=np.int64), '<i8'),
+                'lengths': add(np.array(lengths, dtype=np.int64), '<i8'),
+                'blob': add(np.frombuffer(b''.join(blob), dtype=np.uint8), '|u1')}
+
+    program_types = sorted({lender.program_type for lender in catalog if lender.program_type is not None})
+    toc = [_section(catalog.arrays(program_type), program_type, add, add_text)
+           for program_type in [None] + program_types]
+    toc = json.dumps(toc, separators=(',', ':')).encode('utf-8')
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, catalog.version, len(toc))
+    data_start = _align(HEADER.size + len(toc))
+
+    temp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(header)
+            f.write(toc)
+            f.write(b'\0' * (data_start - HEADER.size - len(toc)))
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class SharedCatalogFile:
+    """Read-only memory map of a published shared catalog file."""
+
+    def __init__(self, path):
+        """
+        Map a shared catalog file.
+
+        Args:
+            path (str): Shared catalog file path
+
+        Raises:
+            ValueError: If the file is not a shared catalog, has an unsupported
+                format version or is truncated
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            # The map keeps the file's data alive even after it is replaced
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.map) < HEADER.size:
+            raise ValueError(f"{path} is not a shared catalog")
+        magic, format_version, _, self.version, toc_length = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a shared catalog")
+        if format_version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported shared catalog format version {format_version}")
+
+        try:
+            toc = json.loads(self.map[HEADER.size:HEADER.size + toc_length].decode('utf-8'))
+        except UnicodeDecodeError as e:
+            raise ValueError(f"{path} is malformed: {e}") from None
+        self.data_start = _align(HEADER.size + toc_length)
+        self.sections = {section['program_type']: section for section in toc}
+        self.mapped = {}
+
+        # Cache keys only include client fields some lender criterion uses
+        all_lenders = self.sections.get(None)
+        if all_lenders is None:
+            raise ValueError(f"{path} is malformed: no section for all lenders")
+        self.criterion_names = frozenset(all_lenders['categories'])
+
+    def array(self, entry):
+        """Return a read-only NumPy view of one array in the file."""
+        dtype, offset, count = entry
+        dtype = np.dtype(dtype)
+        if self.data_start + offset + count * dtype.itemsize > len(self.map):
+            raise ValueError(f"{self.path} is malformed: array past the end of the file")
+        return np.frombuffer(self.map, dtype=dtype, count=count, offset=self.data_start + offset)
+
+    def arrays(self, program_type=None):
+        """
+        Return the mapped arrays for a program type.
+
+        Args:
+            program_type (str): Program type, or None for all lenders
+
+        Returns:
+            MappedLenderArrays: The arrays, or None if no lender offers the program type
+        """
+        arrays = self.mapped.get(program_type)
+        if arrays is None:
+            section = self.sections.get(program_type)
+            if section is None:
+                return None
+            arrays = self.mapped[program_type] = MappedLenderArrays(self, section)
+        return arrays
+
+
+class MappedText:
+    """One text column of a shared catalog section, searched in place."""
+
+    def __init__(self, shared, entry):
+        """
+        Build the views for a text column.
+
+        Args:
+            shared (SharedCatalogFile): The mapped file
+            entry (dict): The column's offsets, lengths and blob entries
+        """
+        self.map = shared.map
+        self.offsets = shared.array(entry['offsets'])
+        self.lengths = shared.array(entry['lengths'])
+        blob = entry['blob']
+        self.start = shared.data_start + blob[1]
+        self.end = self.start + blob[2]
+
+    def get(self, column):
+        """Return a column's raw UTF-8 value, or None if the lender has none."""
+        length = int(self.lengths[column])
+        if length < 0:
+            return None
+        offset = self.start + int(self.offsets[column])
+        return self.map[offset:offset + length]
+
+    def containing(self, value):
+        """
+        Find the lenders whose value contains a byte string.
+
+        Args:
+            value (bytes): Non-empty UTF-8 encoded text to search for
+
+        Returns:
+            numpy.ndarray: Boolean column mask
+        """
+        found = np.zeros(len(self.lengths), dtype=bool)
+        position = self.map.find(value, self.start, self.end)
+        while position != -1:
+            offset = position - self.start
+            column = int(np.searchsorted(self.offsets, offset, side='right')) - 1
+            # Occurrences running over a separator into the next entry do not count
+            if offset + len(value) <= self.offsets[column] + self.lengths[column]:
+                found[column] = True
+            position = self.map.find(value, position + 1, self.end)
+        return found
+
+
+class MappedLenderArrays(LenderArrays):
+    """LenderArrays whose columns are views into a shared catalog file."""
+
+    def __init__(self, shared, section):
+        """
+        Build the views for one section of a shared catalog file.
+
+        Args:
+            shared (SharedCatalogFile): The mapped file
+            section (dict): The section's table of contents entry
+        """
+        entries = section['arrays']
+        self.ids = shared.array(entries['ids'])
+        self.names = MappedText(shared, entries['names'])
+        self.program_types = MappedText(shared, entries['program_types'])
+        self.categories = section['categories']
+        self.present = {name: shared.array(entries[f"present/{name}"]) for name in self.categories}
+        self.low = {name: shared.array(entries[f"low/{name}"]) for name in self.categories}
+        self.high = {name: shared.array(entries[f"high/{name}"]) for name in self.categories}
+        self.masks = {name: shared.array(entries[f"masks/{name}"]) for name in self.categories}
+        self.texts = {name: MappedText(shared, entries[f"texts/{name}"])
+                      for name in self.categories if f"texts/{name}" in entries}
+        self.items = {name: MappedText(shared, entries[f"items/{name}"])
+                      for name in self.categories if f"items/{name}" in entries}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def name(self, column):
+        """Return the name of the lender in a column."""
+        return self.names.get(column).decode('utf-8')
+
+    def program_type(self, column):
+        """Return the program type of the lender in a column."""
+        program_type = self.program_types.get(column)
+        return program_type.decode('utf-8') if program_type is not None else None
+
+    def text_matches(self, name, value):
+        """Return which lenders' generic criterion text matches a client value."""
+        texts = self.texts[name]
+        value = value.lower().encode('utf-8')
+
+        # The client value inside the lender's text, found with one scan of the blob
+        matched = texts.containing(value)
+
+        # The lender's text inside the client value; only texts short enough can be
+        for column in np.flatnonzero(~matched & (texts.lengths >= 0) & (texts.lengths <= len(value))):
+            if texts.get(column) in value:
+                matched[column] = True
+        return matched
+
+    def not_restricted(self, name, profile):
+        """Return which lenders do not restrict the client's value for a restriction criterion."""
+        items = self.items[name]
+        value = profile.get(name).lower().encode('utf-8')
+
+        # The same two directions RestrictionIndex checks: an item containing
+        # the value, which cannot span items unless the value has a comma...
+        restricted = items.containing(value) if SEPARATOR not in value else np.zeros(len(self), dtype=bool)
+
+        # ...or an item inside the value
+        for column in np.flatnonzero(~restricted & (items.lengths >= 0)):
+            if any(item in value for item in items.get(column).split(SEPARATOR)):
+                restricted[column] = True
+        return ~restricted
+
+
+def load_or_publish(path, conn, version):
+    """
+    Map the shared catalog file for a lender catalog version, publishing it first if needed.
+
+    Processes serialize on a lock file, so when the lender data changes only
+    the first one to notice compiles the catalog and writes the new file; the
+    rest wait for it and map the result.
+
+    Args:
+        path (str): Shared catalog file path
+        conn (sqlite3.Connection): Database connection to compile the catalog from
+        version (int): Lender catalog version currently in the database
+
+    Returns:
+        SharedCatalogFile: The mapped file
+    """
+    try:
+        shared = SharedCatalogFile(path)
+        if shared.version == version:
+            return shared
+    except (OSError, ValueError):
+        pass
+
+    with open(f"{path}.lock", 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            shared = SharedCatalogFile(path)
+            if shared.version == version:
+                return shared
+        except (OSError, ValueError):
+            pass
+
+        publish(CompiledLenderCatalog.build(conn, version), path)
+        return SharedCatalogFile(path)
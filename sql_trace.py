@@ -0,0 +1,187 @@
+"""
+BrokerBuddy SQL Tracing
+
+This module records every SQL statement a request runs, with its duration,
+through the trace callback of the pooled connections. Statements of the same
+shape repeated within one request are flagged as N+1 patterns, and
+statements slower than a threshold are written to a rotating log. Recent
+request traces are kept in memory for the debug panel.
+
+SQLite passes the trace callback each statement with its parameters filled
+in. Only the statement's shape, with every literal replaced by "?", is kept
+and logged, so client names, amounts and other form values never reach the
+panel or the log file. Statements are grouped by that shape.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+# String and numeric literals, replaced to group statements by shape
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+WHITESPACE = re.compile(r'\s+')
+
+# Longest statement shape kept, so very long statements stay cheap to hold
+MAX_SQL_LENGTH = 2000
+
+
+def statement_shape(sql):
+    """Return a statement with its literals replaced by placeholders and whitespace collapsed."""
+    return WHITESPACE.sub(' ', LITERALS.sub('?', sql)).strip()
+
+
+class TracedStatement:
+    """The shape of one statement run by a request, with the time spent executing and fetching it."""
+
+    __slots__ = ('sql', 'seconds', 'executions', 'slow')
+
+    def __init__(self, shape):
+        self.sql = shape
+        self.seconds = 0.0
+        self.executions = 1
+        self.slow = None
+
+
+class SQLTracer:
+    """Per-request SQL statement recorder with N+1 and slow query detection."""
+
+    def __init__(self, enabled=True, slow_ms=50.0, n_plus_one=5, log_path=None,
+                 log_max_bytes=5 * 1024 * 1024, log_backups=3, keep=50):
+        """
+        Initialize the tracer.
+
+        Args:
+            enabled (bool): Whether connections record statements
+            slow_ms (float): Statements taking at least this long are logged as slow
+            n_plus_one (int): A statement shape run this many times in one
+                request is flagged as an N+1 pattern
+            log_path (str): Rotating log file for slow statements and N+1
+                patterns; nothing is written to disk if None
+            log_max_bytes (int): Size at which the log file is rotated
+            log_backups (int): Rotated log files kept
+            keep (int): Recent request traces and slow statements kept for the debug panel
+        """
+        self.enabled = enabled
+        self.slow_seconds = slow_ms / 1000
+        self.n_plus_one = n_plus_one
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.recent = deque(maxlen=keep)
+        self.slow = deque(maxlen=keep)
+        self.requests_traced = 0
+        self.n_plus_one_requests = 0
+
+        self.logger = logging.getLogger('brokerbuddy.sql')
+        self.logger.propagate = False
+        if log_path and not self.logger.handlers:
+            handler = RotatingFileHandler(log_path, maxBytes=log_max_bytes, backupCount=log_backups,
+                                          delay=True)
+            handler.setFormatter(logging.Formatter('%(asctime)s %(process)d %(levelname)s %(message)s'))
+            self.logger.addHandler(handler)
+            self.logger.setLevel(logging.INFO)
+
+    def begin(self, label):
+        """Start collecting the statements run by this thread under a request label."""
+        self.local.label = label
+        self.local.started_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        self.local.statements = []
+        self.local.current = None
+
+    def statement(self, sql):
+        """Record a statement starting; called from the connection's trace callback."""
+        # Literals are replaced before truncating, so a cut cannot expose part of one
+        shape = statement_shape(sql)[:MAX_SQL_LENGTH]
+        current = getattr(self.local, 'current', None)
+        # executemany reports every row it runs; count them as one statement
+        if getattr(self.local, 'bulk', False) and current is not None and shape == current.sql:
+            current.executions += 1
+            return
+
+        current = self.local.current = TracedStatement(shape)
+        statements = getattr(self.local, 'statements', None)
+        if statements is not None:
+            statements.append(current)
+
+    def add_time(self, seconds):
+        """Add execution or fetch time to the statement this thread started last."""
+        current = getattr(self.local, 'current', None)
+        if current is None:
+            return
+        current.seconds += seconds
+        if current.seconds >= self.slow_seconds and current.slow is None:
+            # Logged once when the threshold is crossed; the panel entry keeps
+            # the statement itself, so later fetch time still shows there
+            label = self.local.label if getattr(self.local, 'statements', None) is not None else '(no request)'
+            current.slow = {'sql': current.sql, 'request': label, 'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                            'statement': current}
+            with self.lock:
+                self.slow.append(current.slow)
+            self.logger.warning(f"Slow SQL ({current.seconds * 1000:.1f} ms) in {label}: {current.sql}")
+
+    def set_bulk(self, bulk):
+        """Mark whether this thread is inside an executemany call."""
+        self.local.bulk = bulk
+
+    def end(self):
+        """
+        Finish the thread's request trace.
+
+        Returns:
+            dict: The trace summary, or None if no trace was started
+        """
+        statements = getattr(self.local, 'statements', None)
+        self.local.statements = None
+        self.local.current = None
+        if statements is None:
+            return None
+
+        shapes = {}
+        for statement in statements:
+            shape = statement.sql
+            entry = shapes.get(shape)
+            if entry is None:
+                entry = shapes[shape] = {'sql': shape, 'count': 0, 'seconds': 0.0}
+            entry['count'] += 1
+            entry['seconds'] += statement.seconds
+
+        # Transaction control repeats legitimately
+        n_plus_one = sorted((entry for shape, entry in shapes.items()
+                             if entry['count'] >= self.n_plus_one
+                             and not shape.upper().startswith(('BEGIN', 'COMMIT', 'ROLLBACK'))),
+                            key=lambda entry: entry['count'], reverse=True)
+        slowest = sorted(statements, key=lambda statement: statement.seconds, reverse=True)[:5]
+        summary = {
+            'request': self.local.label,
+            'at': self.local.started_at,
+            'statements': len(statements),
+            'seconds': sum(statement.seconds for statement in statements),
+            'n_plus_one': n_plus_one,
+            'slowest': [{'sql': statement.sql, 'seconds': statement.seconds} for statement in slowest]
+        }
+
+        with self.lock:
+            self.recent.append(summary)
+            self.requests_traced += 1
+            if n_plus_one:
+                self.n_plus_one_requests += 1
+        for entry in n_plus_one:
+            self.logger.warning(f"N+1 in {summary['request']}: {entry['count']} x "
+                                f"({entry['seconds'] * 1000:.1f} ms total) {entry['sql']}")
+        return summary
+
+    def snapshot(self):
+        """Return the tracer settings, counters, recent request traces and slow statements, newest first."""
+        with self.lock:
+            return {
+                'enabled': self.enabled,
+                'slow_ms': self.slow_seconds * 1000,
+                'n_plus_one': self.n_plus_one,
+                'requests_traced': self.requests_traced,
+                'n_plus_one_requests': self.n_plus_one_requests,
+                'recent': list(self.recent)[::-1],
+                'slow': [{'sql': entry['sql'], 'request': entry['request'], 'at': entry['at'],
+                          'seconds': entry['statement'].seconds} for entry in self.slow][::-1]
+            }
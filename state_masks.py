@@ -0,0 +1,98 @@
+"""
+BrokerBuddy State Masks
+
+This module normalizes free-text state lists such as "CA, NV, ND" or
+"Both Dakotas Totally restricted" into 64-bit masks with one bit per state,
+so checking a client's state against a lender is a single bitwise AND.
+"""
+
+import re
+
+# US states, DC and territories; the position of each code is its bit
+STATE_CODES = (
+    'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'DC', 'FL', 'GA', 'HI', 'ID', 'IL', 'IN',
+    'IA', 'KS', 'KY', 'LA', 'ME', 'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH',
+    'NJ', 'NM', 'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT',
+    'VT', 'VA', 'WA', 'WV', 'WI', 'WY', 'PR', 'GU', 'VI', 'AS', 'MP'
+)
+
+STATE_BITS = {code: 1 << bit for bit, code in enumerate(STATE_CODES)}
+
+STATE_NAMES = {
+    'alabama': ('AL',), 'alaska': ('AK',), 'arizona': ('AZ',), 'arkansas': ('AR',),
+    'california': ('CA',), 'colorado': ('CO',), 'connecticut': ('CT',), 'delaware': ('DE',),
+    'district of columbia': ('DC',), 'washington dc': ('DC',), 'washington d.c.': ('DC',),
+    'florida': ('FL',), 'georgia': ('GA',), 'hawaii': ('HI',), 'idaho': ('ID',),
+    'illinois': ('IL',), 'indiana': ('IN',), 'iowa': ('IA',), 'kansas': ('KS',),
+    'kentucky': ('KY',), 'louisiana': ('LA',), 'maine': ('ME',), 'maryland': ('MD',),
+    'massachusetts': ('MA',), 'michigan': ('MI',), 'minnesota': ('MN',), 'mississippi': ('MS',),
+    'missouri': ('MO',), 'montana': ('MT',), 'nebraska': ('NE',), 'nevada': ('NV',),
+    'new hampshire': ('NH',), 'new jersey': ('NJ',), 'new mexico': ('NM',), 'new york': ('NY',),
+    'north carolina': ('NC',), 'north dakota': ('ND',), 'ohio': ('OH',), 'oklahoma': ('OK',),
+    'oregon': ('OR',), 'pennsylvania': ('PA',), 'rhode island': ('RI',),
+    'south carolina': ('SC',), 'south dakota': ('SD',), 'tennessee': ('TN',), 'texas': ('TX',),
+    'utah': ('UT',), 'vermont': ('VT',), 'virginia': ('VA',), 'washington': ('WA',),
+    'west virginia': ('WV',), 'wisconsin': ('WI',), 'wyoming': ('WY',),
+    'puerto rico': ('PR',), 'guam': ('GU',), 'virgin islands': ('VI',),
+    'american samoa': ('AS',), 'northern mariana islands': ('MP',),
+    'dakotas': ('ND', 'SD'), 'carolinas': ('NC', 'SC')
+}
+
+# Longest names first so "west virginia" wins over "virginia"
+STATE_NAME_RE = re.compile(
+    r'\b(' + '|'.join(re.escape(name) for name in sorted(STATE_NAMES, key=len, reverse=True)) + r')\b'
+)
+LIST_SEPARATOR_RE = re.compile(r'[,;/&\n]|\band\b')
+
+
+def _token_mask(token):
+    """Return the mask for one list entry, or 0 if it names no state."""
+    mask = 0
+    for match in STATE_NAME_RE.finditer(token):
+        for code in STATE_NAMES[match.group(1)]:
+            mask |= STATE_BITS[code]
+    if mask:
+        return mask
+
+    # Otherwise the entry must be made up of state codes only, e.g. "CA" or "D.C." or "ND SD"
+    words = token.replace('.', '').upper().split()
+    if words and all(word in STATE_BITS for word in words):
+        for word in words:
+            mask |= STATE_BITS[word]
+    return mask
+
+
+def parse_states(text):
+    """
+    Parse a free-text list of states into a bit mask.
+
+    Args:
+        text (str): State list, e.g. "CA, NV, ND" or "Southern Florida, California"
+
+    Returns:
+        tuple: (mask, unparsed) where unparsed lists the entries that named no state
+    """
+    mask = 0
+    unparsed = []
+
+    for token in LIST_SEPARATOR_RE.split(text.lower()):
+        token = token.strip()
+        if not token:
+            continue
+        token_mask = _token_mask(token)
+        if token_mask:
+            mask |= token_mask
+        else:
+            unparsed.append(token)
+
+    return mask, unparsed
+
+
+def state_mask(text):
+    """Return the bit mask of the states named in a client's state value (0 if none)."""
+    return parse_states(text)[0]
+
+
+def mask_states(mask):
+    """Return the state codes set in a mask."""
+    return [code for code in STATE_CODES if mask & STATE_BITS[code]]
@@ -38,6 +38,9 @@ document.addEventListener('DOMContentLoaded', function() {
         toggle.addEventListener('click', function() {
             const details = this.nextElementSibling;
             if (details.style.display === 'none') {
+                if (this.dataset.explainUrl && !details.dataset.loaded) {
+                    loadMatchDetails(this.dataset.explainUrl, details);
+                }
                 details.style.display = 'block';
                 this.textContent = 'Hide Details';
             } else {
@@ -47,6 +50,41 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
+    // Fetch a lender's match details the first time they are shown
+    function loadMatchDetails(url, details) {
+        details.dataset.loaded = 'true';
+        const criteria = details.querySelector('.match-criteria');
+        criteria.textContent = 'Loading...';
+
+        fetch(url)
+            .then(response => response.json())
+            .then(data => {
+                criteria.textContent = '';
+                (data.match_details || []).forEach(detail => {
+                    const item = document.createElement('div');
+                    item.className = 'match-criterion ' +
+                        (detail.result === 'Match' ? 'match-criterion-match' : 'match-criterion-nomatch');
+
+                    const name = document.createElement('strong');
+                    name.textContent = detail.criterion.replace(/_/g, ' ')
+                        .replace(/\b\w/g, letter => letter.toUpperCase()) + ':';
+                    const result = document.createElement('p');
+                    result.append(name, ' ' + detail.result);
+
+                    const reason = document.createElement('p');
+                    reason.className = 'criterion-reason';
+                    reason.textContent = detail.reason;
+
+                    item.append(result, reason);
+                    criteria.appendChild(item);
+                });
+            })
+            .catch(() => {
+                delete details.dataset.loaded;
+                criteria.textContent = 'Could not load match details.';
+            });
+    }
+
     // Admin panel functionality
     const deleteButtons = document.querySelectorAll('.delete-lender');
     deleteButtons.forEach(button => {
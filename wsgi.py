@@ -26,16 +26,9 @@ app.config.update(
     PREFERRED_URL_SCHEME='https'
 )
 
-# Database connection helper
-def get_db():
-    db_path = app.config['DATABASE_PATH']
-    db = BrokerBuddyDB(db_path)
-    db.connect()
-    return db
-
-# Get matching engine
+# Get matching engine; get_db is the pooled helper imported from app below
 def get_matching_engine():
-    db = get_db()
+    db = get_db(readonly=True)
     return MatchingEngine(db.conn)
 
 # Initialize database if it doesn't exist
@@ -48,6 +41,11 @@ def init_db():
 # Import routes after app is created to avoid circular imports
 from app import *
 
+# With gunicorn --preload this runs once in the master, and every worker
+# starts with the compiled catalog, and the shared catalog map, already in memory
+if os.environ.get('PRELOAD_CATALOG') == '1' and os.path.exists(DATABASE_PATH):
+    preload_lender_catalog()
+
 # Initialize the application
 if __name__ == '__main__':
     # Initialize database if needed